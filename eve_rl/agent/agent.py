@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from math import inf
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import logging
 import torch.multiprocessing as mp
@@ -146,6 +146,7 @@ class AgentEvalOnly(EveRLObject, ABC):
         episode_limit: Optional[int] = None,
         seeds: Optional[List[int]] = None,
         options: Optional[List[Dict[str, Any]]] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> List[Episode]:
         ...
 
@@ -268,6 +269,7 @@ class Agent(AgentEvalOnly, ABC):
         episode_limit: Optional[int] = None,
         custom_action_low: Optional[List[float]] = None,
         custom_action_high: Optional[List[float]] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> List[Episode]:
         ...
 
@@ -279,13 +281,14 @@ class Agent(AgentEvalOnly, ABC):
         episodes: Optional[int] = None,
         step_limit: Optional[int] = None,
         episode_limit: Optional[int] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> List[Episode]:
         ...
 
     @abstractmethod
     def update(
         self, *, steps: Optional[int] = None, step_limit: Optional[int] = None
-    ) -> List[List[float]]:
+    ) -> Dict[str, Any]:
         ...
 
     @abstractmethod
@@ -298,7 +301,7 @@ class Agent(AgentEvalOnly, ABC):
         explore_episode_limit: Optional[int] = None,
         update_steps: Optional[int] = None,
         update_step_limit: Optional[int] = None,
-    ) -> Tuple[List[Episode], List[float]]:
+    ) -> Tuple[List[Episode], Dict[str, Any]]:
         ...
 
     @abstractmethod
@@ -311,9 +314,14 @@ class Agent(AgentEvalOnly, ABC):
         episode_limit: Optional[int] = None,
         seeds: Optional[List[int]] = None,
         options: Optional[List[Dict[str, Any]]] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> List[Episode]:
         ...
 
+    @abstractmethod
+    def get_update_timings(self, reset: bool = True) -> Dict[str, Any]:
+        ...
+
     @abstractmethod
     def close(self) -> None:
         ...
@@ -1,14 +1,17 @@
 import platform
-from typing import Any, Dict, List, Optional, Tuple
-from random import randint
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import random
 import logging
 import logging.config
 import os
 import traceback
 import queue
 
+import numpy as np
 from torch import multiprocessing as mp
 import torch
+import torch.distributed as dist
 
 from .agent import (
     Agent,
@@ -18,7 +21,7 @@ from .agent import (
     EpisodeCounter,
 )
 from .single import Single, Algo, ReplayBuffer, gym
-from ..replaybuffer import Episode
+from ..replaybuffer import Episode, EpisodeSummary
 
 
 def file_handler_callback(handler: logging.FileHandler):
@@ -31,7 +34,7 @@ def file_handler_callback(handler: logging.FileHandler):
         }
     }
     if handler.formatter is not None:
-        formatter_name = handler.name or randint(1, 99999)
+        formatter_name = handler.name or random.randint(1, 99999)
         handler_dict[handler.name]["formatter"] = str(formatter_name)
         # pylint: disable=protected-access
         formatter_dict = {str(formatter_name): {"format": handler.formatter._fmt}}
@@ -42,6 +45,9 @@ def file_handler_callback(handler: logging.FileHandler):
 
 handler_callback = {logging.FileHandler: file_handler_callback}
 
+# a trainer rank waiting longer than this in a collective raises, so all ranks can be restarted
+DIST_TIMEOUT = 300
+
 
 def get_logging_config_dict():
     config = {
@@ -87,10 +93,17 @@ def run(
     is_shutdown,
     name,
     nice_level: int,
+    update_stack_size: int,
+    dist_init: Optional[Dict[str, Any]],
+    render_schedule: Union[str, int],
+    episode_results: str,
+    summary_info_keys: Optional[List[str]],
 ):
     if platform.system() != "Windows":
         os.nice(nice_level)
 
+    logger = logging.getLogger(__name__)
+    agent = None
     try:
         torch.set_num_threads(4)
         for handler_name, handler_config in log_config_dict["handlers"].items():
@@ -103,8 +116,17 @@ def run(
                 filename = os.path.join(path, f"{name}.log")
                 log_config_dict["handlers"][handler_name]["filename"] = filename
         logging.config.dictConfig(log_config_dict)
-        logger = logging.getLogger(__name__)
         logger.info("logger initialized")
+        if dist_init is not None:
+            dist.init_process_group(
+                "gloo", timeout=timedelta(seconds=DIST_TIMEOUT), **dist_init
+            )
+            # forked processes share the rng state, each rank needs its own minibatches
+            random.seed()
+            np.random.seed()
+            torch.seed()
+            log_info = f"process group initialized with {dist_init=}"
+            logger.info(log_info)
         agent = Single(
             algo,
             env_train,
@@ -113,6 +135,10 @@ def run(
             device,
             consecutive_action_steps,
             normalize_actions,
+            update_stack_size,
+            render_schedule,
+            episode_results,
+            summary_info_keys,
         )
         agent.step_counter = step_counter
         agent.episode_counter = episode_counter
@@ -136,6 +162,7 @@ def run(
                     episode_limit=task[4],
                     custom_action_low=task[5],
                     custom_action_high=task[6],
+                    episode_callback=result_queue.put if task[7] else None,
                 )
             elif task_name == "explore":
                 result = agent.explore(
@@ -143,6 +170,7 @@ def run(
                     episodes=task[2],
                     step_limit=task[3],
                     episode_limit=task[4],
+                    episode_callback=result_queue.put if task[5] else None,
                 )
             elif task_name == "evaluate":
                 result = agent.evaluate(
@@ -152,6 +180,7 @@ def run(
                     episode_limit=task[4],
                     seeds=task[5],
                     options=task[6],
+                    episode_callback=result_queue.put if task[7] else None,
                 )
             elif task_name == "update":
                 try:
@@ -201,6 +230,10 @@ def run(
                 agent.algo.load_state_dicts_scheduler(state_dicts)
                 del state_dicts
                 continue
+            elif task_name == "get_update_timings":
+                timings = agent.get_update_timings(reset=task[1])
+                model_queue.put(timings)
+                continue
             elif task_name == "shutdown":
                 break
             else:
@@ -211,16 +244,21 @@ def run(
         logger.warning("Traceback:\n" + exception_traceback)
         logger.warning(exception)
         result_queue.put(exception)
-    agent.close()
-
-    for queue_ in [result_queue, model_queue, task_queue]:
-        while True:
-            try:
-                queue_.get_nowait()
-            except queue.Empty:
-                queue_.close()
-                break
-    is_shutdown.set()
+    finally:
+        # also reached if the process group rendezvous fails before the agent exists
+        if agent is not None:
+            agent.close()
+        if dist.is_initialized():
+            dist.destroy_process_group()
+
+        for queue_ in [result_queue, model_queue, task_queue]:
+            while True:
+                try:
+                    queue_.get_nowait()
+                except queue.Empty:
+                    queue_.close()
+                    break
+        is_shutdown.set()
 
 
 class SingleAgentProcess(Agent):
@@ -239,6 +277,11 @@ class SingleAgentProcess(Agent):
         step_counter: StepCounterShared = None,
         episode_counter: EpisodeCounterShared = None,
         nice_level: int = 0,
+        update_stack_size: int = 1,
+        dist_init: Optional[Dict[str, Any]] = None,
+        render_schedule: Union[str, int] = "always",
+        episode_results: str = "full",
+        summary_info_keys: Optional[List[str]] = None,
     ) -> None:
         self.logger = logging.getLogger(self.__module__)
         self.agent_id = agent_id
@@ -248,6 +291,7 @@ class SingleAgentProcess(Agent):
         self._task_queue = mp.Queue()
         self._result_queue = mp.Queue()
         self._model_queue = mp.Queue()
+        self._episode_callback = None
 
         self.device = device
         self.parent_agent = parent_agent
@@ -284,6 +328,11 @@ class SingleAgentProcess(Agent):
                 self._is_shutdown,
                 name,
                 nice_level,
+                update_stack_size,
+                dist_init,
+                render_schedule,
+                episode_results,
+                summary_info_keys,
             ],
             name=name,
         )
@@ -298,7 +347,9 @@ class SingleAgentProcess(Agent):
         episode_limit: Optional[int] = None,
         custom_action_low: Optional[List[float]] = None,
         custom_action_high: Optional[List[float]] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> None:
+        self._episode_callback = episode_callback
         self._task_queue.put(
             [
                 "heatup",
@@ -308,6 +359,7 @@ class SingleAgentProcess(Agent):
                 episode_limit,
                 custom_action_low,
                 custom_action_high,
+                episode_callback is not None,
             ]
         )
 
@@ -318,10 +370,19 @@ class SingleAgentProcess(Agent):
         episodes: Optional[int] = None,
         step_limit: Optional[int] = None,
         episode_limit: Optional[int] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> None:
+        self._episode_callback = episode_callback
         try:
             self._task_queue.put(
-                ["explore", steps, episodes, step_limit, episode_limit]
+                [
+                    "explore",
+                    steps,
+                    episodes,
+                    step_limit,
+                    episode_limit,
+                    episode_callback is not None,
+                ]
             )
         except ValueError:
             self.close()
@@ -335,10 +396,21 @@ class SingleAgentProcess(Agent):
         episode_limit: Optional[int] = None,
         seeds: Optional[List[int]] = None,
         options: Optional[List[Dict[str, Any]]] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> None:
+        self._episode_callback = episode_callback
         try:
             self._task_queue.put(
-                ["evaluate", steps, episodes, step_limit, episode_limit, seeds, options]
+                [
+                    "evaluate",
+                    steps,
+                    episodes,
+                    step_limit,
+                    episode_limit,
+                    seeds,
+                    options,
+                    episode_callback is not None,
+                ]
             )
         except ValueError:
             self.close()
@@ -360,7 +432,7 @@ class SingleAgentProcess(Agent):
         explore_episode_limit: Optional[int] = None,
         update_steps: Optional[int] = None,
         update_step_limit: Optional[int] = None,
-    ) -> Tuple[List[Episode], List[float]]:
+    ) -> None:
         try:
             self._task_queue.put(
                 [
@@ -376,9 +448,14 @@ class SingleAgentProcess(Agent):
         except ValueError:
             self.close()
 
+    # with an episode_callback the worker sends each finished episode on its own,
+    # they are passed to the callback here before the (empty) episode list of the task
     def get_result(self, timeout: float) -> List[Any]:
         try:
             result = self._result_queue.get(timeout=timeout)
+            while isinstance(result, (Episode, EpisodeSummary)):
+                self._episode_callback(result)
+                result = self._result_queue.get(timeout=timeout)
         except queue.Empty as error:
             result = error
         except ValueError:
@@ -428,6 +505,14 @@ class SingleAgentProcess(Agent):
         except ValueError:
             self.close()
 
+    def get_update_timings(self, reset: bool = True) -> Dict[str, Any]:
+        try:
+            self._task_queue.put(["get_update_timings", reset])
+            return self._model_queue.get()
+        except ValueError:
+            self.close()
+            return None
+
     def close(self) -> None:
         if self._process is not None and self._process.is_alive():
             self._shutdown.set()
@@ -1,31 +1,40 @@
 from copy import deepcopy
 from importlib import import_module
 from time import perf_counter
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 import logging
 import torch
+import torch.distributed as dist
 import numpy as np
 import gymnasium as gym
 
 from .agent import Agent, StepCounter, EpisodeCounter, AgentEvalOnly
 from ..algo import Algo, AlgoPlayOnly
-from ..replaybuffer import ReplayBuffer, Episode
-from ..util import ConfigHandler, flatten_obs
+from ..replaybuffer import ReplayBuffer, Episode, EpisodeSummary
+from ..util import ConfigHandler, ObsFlattener
 
 
 class SingleEvalOnly(AgentEvalOnly):
     def __init__(
         self,
         algo: AlgoPlayOnly,
-        env_eval: gym.Env,
+        env_eval: Union[gym.Env, List[gym.Env]],
         device: torch.device = torch.device("cpu"),
         normalize_actions: bool = True,
+        render_schedule: Union[str, int] = "always",
+        episode_results: str = "full",
+        summary_info_keys: Optional[List[str]] = None,
     ) -> None:
         self.logger = logging.getLogger(self.__module__)
         self.device = device
         self.algo = algo
         self.env_eval = env_eval
         self.normalize_actions = normalize_actions
+        self.render_schedule = render_schedule
+        self.episode_results = episode_results
+        self.summary_info_keys = summary_info_keys
+        self._check_render_schedule()
+        self._check_episode_results()
 
         self.step_counter = StepCounter()
         self.episode_counter = EpisodeCounter()
@@ -43,6 +52,7 @@ class SingleEvalOnly(AgentEvalOnly):
         episode_limit: Optional[int] = None,
         seeds: Optional[List[int]] = None,
         options: Optional[List[Dict[str, Any]]] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> List[Episode]:
         t_start = perf_counter()
         self._log_eval(steps, step_limit, episodes, episode_limit, seeds, options)
@@ -52,37 +62,52 @@ class SingleEvalOnly(AgentEvalOnly):
         seeds = deepcopy(seeds)
         options = deepcopy(options)
         episodes_data = []
+        collect_episode = self._episode_collector(episodes_data, episode_callback)
         n_episodes = 0
         n_steps = 0
 
-        while True:
-            with self.episode_counter.lock:
-                self.episode_counter.evaluation += 1
-
-            next_seed = seeds.pop(-1) if seeds is not None else None
-            next_options = options.pop(-1) if options is not None else None
-
-            episode, n_steps_episode = self._play_episode(
-                env=self.env_eval,
-                action_function=self.algo.get_eval_action,
+        if isinstance(self.env_eval, list):
+            n_steps, n_episodes = self._play_episodes(
+                envs=self.env_eval,
+                action_function=self.algo.get_eval_action_batch,
                 consecutive_actions=1,
-                seed=next_seed,
-                options=next_options,
+                task="evaluation",
+                step_limit=step_limit,
+                episode_limit=episode_limit,
+                seeds=seeds,
+                options=options,
+                episode_callback=collect_episode,
             )
+        else:
+            while True:
+                with self.episode_counter.lock:
+                    self.episode_counter.evaluation += 1
+
+                next_seed = seeds.pop(-1) if seeds is not None else None
+                next_options = options.pop(-1) if options is not None else None
+
+                episode, n_steps_episode = self._play_episode(
+                    env=self.env_eval,
+                    action_function=self.algo.get_eval_action,
+                    consecutive_actions=1,
+                    seed=next_seed,
+                    options=next_options,
+                    render=self._render_episode("evaluation"),
+                )
 
-            with self.step_counter.lock:
-                self.step_counter.evaluation += n_steps_episode
+                with self.step_counter.lock:
+                    self.step_counter.evaluation += n_steps_episode
 
-            n_episodes += 1
-            n_steps += n_steps_episode
-            episodes_data.append(episode)
+                n_episodes += 1
+                n_steps += n_steps_episode
+                collect_episode(episode)
 
-            if (
-                (not seeds and not options)
-                or self.step_counter.evaluation > step_limit
-                or self.episode_counter.evaluation > episode_limit
-            ):
-                break
+                if (
+                    (not seeds and not options)
+                    or self.step_counter.evaluation > step_limit
+                    or self.episode_counter.evaluation > episode_limit
+                ):
+                    break
 
         t_duration = perf_counter() - t_start
         self._log_task_completion("evaluation", n_steps, t_duration, n_episodes)
@@ -95,6 +120,7 @@ class SingleEvalOnly(AgentEvalOnly):
         consecutive_actions: int,
         seed: Optional[int] = None,
         options: Optional[Dict[str, Any]] = None,
+        render: bool = True,
     ) -> Tuple[Episode, int]:
         terminal = False
         truncation = False
@@ -102,22 +128,21 @@ class SingleEvalOnly(AgentEvalOnly):
 
         self.algo.reset()
         obs, _ = env.reset(seed=seed, options=options)
-        flat_obs, flat_obs_to_obs = flatten_obs(obs)
-        episode = Episode(obs, flat_obs, flat_obs_to_obs, seed, options)
+        flatten = ObsFlattener(obs)
+        flat_obs = flatten(obs)
+        episode = Episode(obs, flat_obs, flatten.flat_obs_to_obs, seed, options)
+        action_transform = self._action_transform(env)
 
         while not (terminal or truncation):
             action = action_function(flat_obs)
 
             for _ in range(consecutive_actions):
-                env_action = action.reshape(env.action_space.shape)
-                if self.normalize_actions:
-                    env_action = (env_action + 1) / 2 * (
-                        env.action_space.high - env.action_space.low
-                    ) + env.action_space.low
+                env_action = self._env_action(action, action_transform)
                 obs, reward, terminal, truncation, info = env.step(env_action)
-                flat_obs, _ = flatten_obs(obs)
+                flat_obs = flatten(obs)
                 step_counter += 1
-                env.render()
+                if render:
+                    env.render()
                 episode.add_transition(
                     obs, flat_obs, action, reward, terminal, truncation, info
                 )
@@ -126,12 +151,183 @@ class SingleEvalOnly(AgentEvalOnly):
 
         return episode, step_counter
 
+    # Plays the envs side by side with one batched action per step. Every env has its
+    # own episode and recurrent state (row of the batch). New episodes are started
+    # while the limits allow it, counting the steps of the running episodes.
+    # Finished episodes are passed to episode_callback, returns n_steps, n_episodes.
+    def _play_episodes(
+        self,
+        envs: List[gym.Env],
+        action_function: Callable[[np.ndarray], np.ndarray],
+        consecutive_actions: int,
+        task: str,
+        step_limit: int,
+        episode_limit: int,
+        seeds: Optional[List[int]] = None,
+        options: Optional[List[Dict[str, Any]]] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
+    ) -> Tuple[int, int]:
+        n_envs = len(envs)
+        episodes: List[Optional[Episode]] = [None] * n_envs
+        flattens: List[Optional[ObsFlattener]] = [None] * n_envs
+        renders = [False] * n_envs
+        action_transforms = [self._action_transform(env) for env in envs]
+        flat_obs_batch: np.ndarray = None
+        n_steps_finished = 0
+        n_episodes_finished = 0
+
+        def start_episode() -> bool:
+            running_steps = sum(
+                len(episode) for episode in episodes if episode is not None
+            )
+            n_steps = getattr(self.step_counter, task) + running_steps
+            n_episodes = getattr(self.episode_counter, task)
+            if task != "evaluation":
+                return n_steps < step_limit and n_episodes < episode_limit
+            # same as the single env evaluation, the first episode always starts
+            if not n_episodes_finished and episodes.count(None) == n_envs:
+                return True
+            return (
+                bool(seeds or options)
+                and n_steps <= step_limit
+                and n_episodes <= episode_limit
+            )
+
+        self.algo.reset()
+        while True:
+            for i, env in enumerate(envs):
+                if episodes[i] is not None or not start_episode():
+                    continue
+                with self.episode_counter.lock:
+                    setattr(
+                        self.episode_counter,
+                        task,
+                        getattr(self.episode_counter, task) + 1,
+                    )
+                seed = seeds.pop(-1) if seeds else None
+                option = options.pop(-1) if options else None
+                self.algo.reset([i])
+                renders[i] = self._render_episode(task)
+                obs, _ = env.reset(seed=seed, options=option)
+                flattens[i] = ObsFlattener(obs)
+                flat_obs = flattens[i](obs)
+                if flat_obs_batch is None:
+                    # finished envs keep their last row, the batch size stays constant
+                    flat_obs_batch = np.zeros((n_envs, *flat_obs.shape), flat_obs.dtype)
+                flat_obs_batch[i] = flat_obs
+                flat_obs_to_obs = flattens[i].flat_obs_to_obs
+                episodes[i] = Episode(obs, flat_obs, flat_obs_to_obs, seed, option)
+
+            if episodes.count(None) == n_envs:
+                break
+
+            actions = action_function(flat_obs_batch)
+            for i, env in enumerate(envs):
+                episode = episodes[i]
+                if episode is None:
+                    continue
+                action = actions[i]
+                for _ in range(consecutive_actions):
+                    env_action = self._env_action(action, action_transforms[i])
+                    obs, reward, terminal, truncation, info = env.step(env_action)
+                    flat_obs = flattens[i](obs)
+                    if renders[i]:
+                        env.render()
+                    episode.add_transition(
+                        obs, flat_obs, action, reward, terminal, truncation, info
+                    )
+                    if terminal or truncation:
+                        break
+                flat_obs_batch[i] = flat_obs
+                if terminal or truncation:
+                    with self.step_counter.lock:
+                        setattr(
+                            self.step_counter,
+                            task,
+                            getattr(self.step_counter, task) + len(episode),
+                        )
+                    n_steps_finished += len(episode)
+                    n_episodes_finished += 1
+                    episodes[i] = None
+                    if episode_callback is not None:
+                        episode_callback(episode)
+
+        return n_steps_finished, n_episodes_finished
+
+    # shape, half range and low of the action space, computed once per episode
+    def _action_transform(
+        self, env: gym.Env
+    ) -> Tuple[Tuple[int, ...], Optional[np.ndarray], Optional[np.ndarray]]:
+        action_space = env.action_space
+        if not self.normalize_actions:
+            return action_space.shape, None, None
+        half_range = (action_space.high - action_space.low) / 2
+        return action_space.shape, half_range, action_space.low
+
+    @staticmethod
+    def _env_action(
+        action: np.ndarray,
+        action_transform: Tuple[
+            Tuple[int, ...], Optional[np.ndarray], Optional[np.ndarray]
+        ],
+    ) -> np.ndarray:
+        shape, half_range, low = action_transform
+        env_action = action.reshape(shape)
+        if half_range is not None:
+            env_action = (env_action + 1) * half_range + low
+        return env_action
+
+    def _check_render_schedule(self) -> None:
+        schedule = self.render_schedule
+        if isinstance(schedule, bool) or (
+            schedule not in ["always", "never", "evaluation"]
+            and not (isinstance(schedule, int) and schedule > 0)
+        ):
+            raise ValueError(
+                f"{schedule=} must be 'always', 'never', 'evaluation' or a positive int"
+            )
+
+    def _check_episode_results(self) -> None:
+        if self.episode_results not in ["full", "summary"]:
+            raise ValueError(f"{self.episode_results=} must be 'full' or 'summary'")
+
+    # With episode_results "summary" only EpisodeSummary are returned (or streamed),
+    # the full episodes are dropped after being pushed to the replay buffer.
+    def _episode_collector(
+        self,
+        episodes_data: List[Union[Episode, EpisodeSummary]],
+        episode_callback: Optional[Callable[[Episode], None]] = None,
+    ) -> Callable[[Episode], None]:
+        collect = episode_callback or episodes_data.append
+        if self.episode_results == "full":
+            return collect
+
+        def collect_summary(episode: Episode) -> None:
+            collect(episode.to_summary(self.summary_info_keys))
+
+        return collect_summary
+
+    # called after the episode counter of the task was increased
+    def _render_episode(self, task: str) -> bool:
+        if self.render_schedule == "always":
+            return True
+        if self.render_schedule == "never":
+            return False
+        if self.render_schedule == "evaluation":
+            return task == "evaluation"
+        return (getattr(self.episode_counter, task) - 1) % self.render_schedule == 0
+
     def to(self, device: torch.device):
         self.device = device
         self.algo.to(device)
 
     def close(self):
-        self.env_eval.close()
+        for env in self._envs(self.env_eval):
+            env.close()
+
+    @staticmethod
+    def _envs(env: Union[gym.Env, List[gym.Env]]) -> List[gym.Env]:
+        return env if isinstance(env, list) else [env]
 
     @classmethod
     def from_checkpoint(
@@ -140,18 +336,28 @@ class SingleEvalOnly(AgentEvalOnly):
         device: torch.device = torch.device("cpu"),
         normalize_actions: bool = True,
         env_eval: Optional[gym.Env] = None,
+        render_schedule: Union[str, int] = "always",
+        episode_results: str = "full",
+        summary_info_keys: Optional[List[str]] = None,
     ):
         cp = torch.load(checkpoint_path)
         confighandler = ConfigHandler()
-        algo: Algo = confighandler.config_dict_to_object(cp["algo"])
+        algo = confighandler.config_dict_to_object(cp["algo"])
+        if isinstance(algo, Algo):
+            algo = algo.to_play_only()
+        elif not isinstance(algo, AlgoPlayOnly):
+            raise ValueError("Wrong Algo Class in Checkpoint")
         eve = import_module("eve.util")
         eve_cfh = eve.ConfigHandler()
         env_eval = env_eval or eve_cfh.config_dict_to_object(cp["env_eval"])
         agent = cls(
-            algo.to_play_only(),
+            algo,
             env_eval,
             device,
             normalize_actions,
+            render_schedule,
+            episode_results,
+            summary_info_keys,
         )
         agent.load_checkpoint(checkpoint_path)
         return agent
@@ -161,12 +367,16 @@ class Single(SingleEvalOnly, Agent):
     def __init__(  # pylint: disable=super-init-not-called
         self,
         algo: Algo,
-        env_train: gym.Env,
-        env_eval: gym.Env,
+        env_train: Union[gym.Env, List[gym.Env]],
+        env_eval: Union[gym.Env, List[gym.Env]],
         replay_buffer: ReplayBuffer,
         device: torch.device = torch.device("cpu"),
         consecutive_action_steps: int = 1,
         normalize_actions: bool = True,
+        update_stack_size: int = 1,
+        render_schedule: Union[str, int] = "always",
+        episode_results: str = "full",
+        summary_info_keys: Optional[List[str]] = None,
     ) -> None:
         self.logger = logging.getLogger(self.__module__)
         self.device = device
@@ -176,6 +386,12 @@ class Single(SingleEvalOnly, Agent):
         self.replay_buffer = replay_buffer
         self.consecutive_action_steps = consecutive_action_steps
         self.normalize_actions = normalize_actions
+        self.update_stack_size = update_stack_size
+        self.render_schedule = render_schedule
+        self.episode_results = episode_results
+        self.summary_info_keys = summary_info_keys
+        self._check_render_schedule()
+        self._check_episode_results()
 
         self.update_error = False
 
@@ -195,6 +411,7 @@ class Single(SingleEvalOnly, Agent):
         episode_limit: Optional[int] = None,
         custom_action_low: Optional[List[float]] = None,
         custom_action_high: Optional[List[float]] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> List[Episode]:
         t_start = perf_counter()
         self._log_heatup(
@@ -210,10 +427,17 @@ class Single(SingleEvalOnly, Agent):
         )
 
         episodes_data = []
+        collect_episode = self._episode_collector(episodes_data, episode_callback)
+
+        def push_episode(episode: Episode) -> None:
+            self.replay_buffer.push(episode)
+            collect_episode(episode)
+
+        action_space = self._envs(self.env_train)[0].action_space
 
         def random_action(*args, **kwargs):  # pylint: disable=unused-argument
-            env_low = self.env_train.action_space.low.reshape(-1)
-            env_high = self.env_train.action_space.high.reshape(-1)
+            env_low = action_space.low.reshape(-1)
+            env_high = action_space.high.reshape(-1)
 
             if custom_action_low is not None:
                 action_low = np.array(custom_action_low).reshape(-1)
@@ -230,27 +454,41 @@ class Single(SingleEvalOnly, Agent):
 
             return action
 
+        def random_action_batch(flat_obs_batch: np.ndarray) -> np.ndarray:
+            return np.stack([random_action() for _ in flat_obs_batch])
+
         n_episodes = 0
         n_steps = 0
-        while (
-            self.step_counter.heatup < step_limit
-            and self.episode_counter.heatup < episode_limit
-        ):
-            with self.episode_counter.lock:
-                self.episode_counter.heatup += 1
-
-            episode, n_steps_episode = self._play_episode(
-                env=self.env_train,
-                action_function=random_action,
+        if isinstance(self.env_train, list):
+            n_steps, n_episodes = self._play_episodes(
+                envs=self.env_train,
+                action_function=random_action_batch,
                 consecutive_actions=self.consecutive_action_steps,
+                task="heatup",
+                step_limit=step_limit,
+                episode_limit=episode_limit,
+                episode_callback=push_episode,
             )
+        else:
+            while (
+                self.step_counter.heatup < step_limit
+                and self.episode_counter.heatup < episode_limit
+            ):
+                with self.episode_counter.lock:
+                    self.episode_counter.heatup += 1
+
+                episode, n_steps_episode = self._play_episode(
+                    env=self.env_train,
+                    action_function=random_action,
+                    consecutive_actions=self.consecutive_action_steps,
+                    render=self._render_episode("heatup"),
+                )
 
-            with self.step_counter.lock:
-                self.step_counter.heatup += n_steps_episode
-            n_steps += n_steps_episode
-            n_episodes += 1
-            self.replay_buffer.push(episode)
-            episodes_data.append(episode)
+                with self.step_counter.lock:
+                    self.step_counter.heatup += n_steps_episode
+                n_steps += n_steps_episode
+                n_episodes += 1
+                push_episode(episode)
 
         t_duration = perf_counter() - t_start
         self._log_task_completion("heatup", n_steps, t_duration, n_episodes)
@@ -263,6 +501,7 @@ class Single(SingleEvalOnly, Agent):
         episodes: Optional[int] = None,
         step_limit: Optional[int] = None,
         episode_limit: Optional[int] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> List[Episode]:
         t_start = perf_counter()
         self._log_exploration(steps, step_limit, episodes, episode_limit)
@@ -271,29 +510,46 @@ class Single(SingleEvalOnly, Agent):
         )
 
         episodes_data = []
+        collect_episode = self._episode_collector(episodes_data, episode_callback)
+
+        def push_episode(episode: Episode) -> None:
+            self.replay_buffer.push(episode)
+            collect_episode(episode)
+
         n_episodes = 0
         n_steps = 0
-        while (
-            self.step_counter.exploration < step_limit
-            and self.episode_counter.exploration < episode_limit
-        ):
-            with self.episode_counter.lock:
-                self.episode_counter.exploration += 1
-
-            episode, n_steps_episode = self._play_episode(
-                env=self.env_train,
-                action_function=self.algo.get_exploration_action,
+        if isinstance(self.env_train, list):
+            n_steps, n_episodes = self._play_episodes(
+                envs=self.env_train,
+                action_function=self.algo.get_exploration_action_batch,
                 consecutive_actions=self.consecutive_action_steps,
+                task="exploration",
+                step_limit=step_limit,
+                episode_limit=episode_limit,
+                episode_callback=push_episode,
             )
+        else:
+            while (
+                self.step_counter.exploration < step_limit
+                and self.episode_counter.exploration < episode_limit
+            ):
+                with self.episode_counter.lock:
+                    self.episode_counter.exploration += 1
+
+                episode, n_steps_episode = self._play_episode(
+                    env=self.env_train,
+                    action_function=self.algo.get_exploration_action,
+                    consecutive_actions=self.consecutive_action_steps,
+                    render=self._render_episode("exploration"),
+                )
 
-            with self.step_counter.lock:
-                self.step_counter.exploration += n_steps_episode
+                with self.step_counter.lock:
+                    self.step_counter.exploration += n_steps_episode
 
-            n_episodes += 1
-            n_steps += n_steps_episode
+                n_episodes += 1
+                n_steps += n_steps_episode
 
-            self.replay_buffer.push(episode)
-            episodes_data.append(episode)
+                push_episode(episode)
 
         t_duration = perf_counter() - t_start
         self._log_task_completion("exploration", n_steps, t_duration, n_episodes)
@@ -301,31 +557,43 @@ class Single(SingleEvalOnly, Agent):
 
     def update(
         self, *, steps: Optional[int] = None, step_limit: Optional[int] = None
-    ) -> List[List[float]]:
+    ) -> Dict[str, Any]:
         t_start = perf_counter()
         self._log_update(steps, step_limit)
         step_limit, _ = self._log_and_convert_limits("update", steps, step_limit)
-        results = []
         if self._replay_too_small:
             replay_len = len(self.replay_buffer)
             batch_size = self.replay_buffer.batch_size
-            self._replay_too_small = replay_len <= batch_size
+            self._replay_too_small = self._any_rank(replay_len <= batch_size)
         if self._replay_too_small or step_limit == 0 or steps == 0:
-            return []
+            return {}
 
         n_steps = 0
 
         while self.step_counter.update < step_limit:
+            n_stack = min(self.update_stack_size, step_limit - self.step_counter.update)
             with self.step_counter.lock:
-                self.step_counter.update += 1
-            batch = self.replay_buffer.sample()
-            result = self.algo.update(batch)
-            results.append(result)
-            n_steps += 1
+                self.step_counter.update += n_stack
+            if n_stack > 1:
+                batch = self.replay_buffer.sample_stack(n_stack)
+                self.algo.update_stack(batch)
+            else:
+                batch = self.replay_buffer.sample()
+                self.algo.update(batch)
+            n_steps += n_stack
 
         t_duration = perf_counter() - t_start
         self._log_task_completion("update", n_steps, t_duration)
-        return results
+        return self.algo.get_loss_stats()
+
+    # data parallel trainers must skip or run the gradient all_reduce together
+    @staticmethod
+    def _any_rank(flag: bool) -> bool:
+        if not (dist.is_available() and dist.is_initialized()):
+            return flag
+        flag_tensor = torch.tensor([int(flag)])
+        dist.all_reduce(flag_tensor, op=dist.ReduceOp.MAX)
+        return bool(flag_tensor.item())
 
     def explore_and_update(
         self,
@@ -336,7 +604,7 @@ class Single(SingleEvalOnly, Agent):
         explore_episode_limit: Optional[int] = None,
         update_steps: Optional[int] = None,
         update_step_limit: Optional[int] = None,
-    ) -> Tuple[List[Episode], List[float]]:
+    ) -> Tuple[List[Episode], Dict[str, Any]]:
         explore_result = self.explore(
             steps=explore_steps,
             episodes=explore_episodes,
@@ -346,10 +614,17 @@ class Single(SingleEvalOnly, Agent):
         update_result = self.update(steps=update_steps, step_limit=update_step_limit)
         return explore_result, update_result
 
+    def get_update_timings(self, reset: bool = True) -> Dict[str, Any]:
+        return self.algo.get_update_timings(reset)
+
     def close(self):
-        self.env_train.close()
-        if id(self.env_train) != id(self.env_eval):
-            self.env_eval.close()
+        env_train = self._envs(self.env_train)
+        env_eval = self._envs(self.env_eval)
+        for env in env_train:
+            env.close()
+        for env in env_eval:
+            if all(id(env) != id(train_env) for train_env in env_train):
+                env.close()
         self.replay_buffer.close()
         del self.algo
         del self.replay_buffer
@@ -364,6 +639,10 @@ class Single(SingleEvalOnly, Agent):
         env_train: Optional[gym.Env] = None,
         env_eval: Optional[gym.Env] = None,
         replay_buffer: Optional[ReplayBuffer] = None,
+        update_stack_size: int = 1,
+        render_schedule: Union[str, int] = "always",
+        episode_results: str = "full",
+        summary_info_keys: Optional[List[str]] = None,
     ):
         cp = torch.load(checkpoint_path)
         confighandler = ConfigHandler()
@@ -383,6 +662,10 @@ class Single(SingleEvalOnly, Agent):
             device,
             consecutive_action_steps,
             normalize_actions,
+            update_stack_size,
+            render_schedule,
+            episode_results,
+            summary_info_keys,
         )
         agent.load_checkpoint(checkpoint_path)
         return agent
@@ -1,9 +1,10 @@
 from copy import deepcopy
 from importlib import import_module
 from time import perf_counter, sleep
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from math import inf
 import logging
+import socket
 import torch
 import queue
 
@@ -15,7 +16,7 @@ from .agent import (
     EpisodeCounterShared,
 )
 from .single import Algo, ReplayBuffer, gym
-from .singelagentprocess import SingleAgentProcess
+from .singelagentprocess import SingleAgentProcess, DIST_TIMEOUT
 from ..util import ConfigHandler
 
 
@@ -28,6 +29,9 @@ class SynchronEvalOnly(Agent):
         worker_device: torch.device = torch.device("cpu"),
         normalize_actions: bool = True,
         timeout_worker_after_reaching_limit: float = 90,
+        render_schedule: Union[str, int] = "always",
+        episode_results: str = "full",
+        summary_info_keys: Optional[List[str]] = None,
     ) -> None:
         self.algo = algo
         self.algo.to(torch.device("cpu"))
@@ -35,6 +39,9 @@ class SynchronEvalOnly(Agent):
         self.worker_device = worker_device
         self.normalize_actions = normalize_actions
         self.timeout_worker_after_reaching_limit = timeout_worker_after_reaching_limit
+        self.render_schedule = render_schedule
+        self.episode_results = episode_results
+        self.summary_info_keys = summary_info_keys
 
         self.logger = logging.getLogger(self.__module__)
         self.n_worker = n_worker
@@ -47,6 +54,7 @@ class SynchronEvalOnly(Agent):
 
         self._eval_seeds = None
         self._eval_options = None
+        self._episode_callback = None
 
         self.logger.info("Synchron Agent initialized")
 
@@ -59,6 +67,7 @@ class SynchronEvalOnly(Agent):
         episode_limit: Optional[int] = None,
         seeds: Optional[List[int]] = None,
         options: Optional[List[Dict[str, Any]]] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> List[Episode]:
         t_start = perf_counter()
         steps_start = self.step_counter.evaluation
@@ -71,6 +80,7 @@ class SynchronEvalOnly(Agent):
             self._eval_seeds = self._split(seeds, self.n_worker)
         if options is not None:
             self._eval_options = self._split(options, self.n_worker)
+        self._episode_callback = episode_callback
 
         for agent in self.worker:
             i = agent.agent_id
@@ -81,11 +91,13 @@ class SynchronEvalOnly(Agent):
                 episode_limit=episode_limit,
                 seeds=agent_seeds,
                 options=agent_options,
+                episode_callback=episode_callback,
             )
 
         self._eval_seeds = None
         self._eval_options = None
         result = self._get_worker_results(step_limit, episode_limit, "evaluation")
+        self._episode_callback = None
 
         n_steps = self.step_counter.evaluation - steps_start
         n_episodes = self.episode_counter.evaluation - episodes_start
@@ -202,6 +214,7 @@ class SynchronEvalOnly(Agent):
             episode_limit=episode_limit,
             seeds=seeds,
             options=options,
+            episode_callback=self._episode_callback,
         )
         return new_agent
 
@@ -220,6 +233,9 @@ class SynchronEvalOnly(Agent):
             step_counter=self.step_counter,
             episode_counter=self.episode_counter,
             nice_level=10,
+            render_schedule=self.render_schedule,
+            episode_results=self.episode_results,
+            summary_info_keys=self.summary_info_keys,
         )
 
     def load_checkpoint(self, file_path: str) -> None:
@@ -244,6 +260,9 @@ class SynchronEvalOnly(Agent):
         normalize_actions: bool = True,
         timeout_worker_after_reaching_limit: float = 90,
         env_eval: Optional[gym.Env] = None,
+        render_schedule: Union[str, int] = "always",
+        episode_results: str = "full",
+        summary_info_keys: Optional[List[str]] = None,
     ):
         cp = torch.load(checkpoint_path)
         confighandler = ConfigHandler()
@@ -258,6 +277,9 @@ class SynchronEvalOnly(Agent):
             worker_device,
             normalize_actions,
             timeout_worker_after_reaching_limit,
+            render_schedule,
+            episode_results,
+            summary_info_keys,
         )
         agent.load_checkpoint(checkpoint_path)
         return agent
@@ -276,6 +298,11 @@ class Synchron(SynchronEvalOnly, Agent):
         consecutive_action_steps: int = 1,
         normalize_actions: bool = True,
         timeout_worker_after_reaching_limit: float = 90,
+        update_stack_size: int = 1,
+        n_trainer: int = 1,
+        render_schedule: Union[str, int] = "always",
+        episode_results: str = "full",
+        summary_info_keys: Optional[List[str]] = None,
     ) -> None:
         self.algo = algo
         self.algo.to(torch.device("cpu"))
@@ -286,6 +313,11 @@ class Synchron(SynchronEvalOnly, Agent):
         self.consecutive_action_steps = consecutive_action_steps
         self.normalize_actions = normalize_actions
         self.timeout_worker_after_reaching_limit = timeout_worker_after_reaching_limit
+        self.update_stack_size = update_stack_size
+        self.n_trainer = n_trainer
+        self.render_schedule = render_schedule
+        self.episode_results = episode_results
+        self.summary_info_keys = summary_info_keys
 
         self.logger = logging.getLogger(self.__module__)
         self.n_worker = n_worker
@@ -297,12 +329,13 @@ class Synchron(SynchronEvalOnly, Agent):
         for i in range(n_worker):
             self.worker.append(self._create_worker_agent(i))
 
-        self.trainer = self._create_trainer_agent()
+        self.trainers = self._create_trainer_agents()
 
         self.update_error = False
 
         self._eval_seeds = None
         self._eval_options = None
+        self._episode_callback = None
 
         self.logger.info("Synchron Agent initialized")
 
@@ -315,6 +348,7 @@ class Synchron(SynchronEvalOnly, Agent):
         episode_limit: Optional[int] = None,
         custom_action_low: Optional[List[float]] = None,
         custom_action_high: Optional[List[float]] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> List[Episode]:
         t_start = perf_counter()
         steps_start = self.step_counter.heatup
@@ -330,14 +364,17 @@ class Synchron(SynchronEvalOnly, Agent):
         step_limit, episode_limit = self._log_and_convert_limits(
             "heatup", steps, step_limit, episodes, episode_limit
         )
+        self._episode_callback = episode_callback
         for agent in self.worker:
             agent.heatup(
                 step_limit=step_limit,
                 episode_limit=episode_limit,
                 custom_action_low=custom_action_low,
                 custom_action_high=custom_action_high,
+                episode_callback=episode_callback,
             )
         result = self._get_worker_results(step_limit, episode_limit, "heatup")
+        self._episode_callback = None
         n_steps = self.step_counter.heatup - steps_start
         n_episodes = self.episode_counter.heatup - episodes_start
         t_duration = perf_counter() - t_start
@@ -351,6 +388,7 @@ class Synchron(SynchronEvalOnly, Agent):
         episodes: Optional[int] = None,
         step_limit: Optional[int] = None,
         episode_limit: Optional[int] = None,
+        episode_callback: Optional[Callable[[Episode], None]] = None,
     ) -> List[Episode]:
         t_start = perf_counter()
         steps_start = self.step_counter.exploration
@@ -361,9 +399,15 @@ class Synchron(SynchronEvalOnly, Agent):
             "exploration", steps, step_limit, episodes, episode_limit
         )
 
+        self._episode_callback = episode_callback
         for agent in self.worker:
-            agent.explore(step_limit=step_limit, episode_limit=episode_limit)
+            agent.explore(
+                step_limit=step_limit,
+                episode_limit=episode_limit,
+                episode_callback=episode_callback,
+            )
         result = self._get_worker_results(step_limit, episode_limit, "exploration")
+        self._episode_callback = None
 
         n_episodes = self.episode_counter.exploration - episodes_start
         n_steps = self.step_counter.exploration - steps_start
@@ -373,13 +417,15 @@ class Synchron(SynchronEvalOnly, Agent):
 
     def update(
         self, *, steps: Optional[int] = None, step_limit: Optional[int] = None
-    ) -> List[float]:
+    ) -> Dict[str, Any]:
         t_start = perf_counter()
         steps_start = self.step_counter.update
         self._log_update(steps, step_limit)
         step_limit, _ = self._log_and_convert_limits("update", steps, step_limit)
 
-        self.trainer.update(steps=steps, step_limit=step_limit)
+        self._sync_trainer_step_counters()
+        for trainer in self.trainers:
+            trainer.update(steps=steps, step_limit=step_limit)
         result = self._get_trainer_results()
         self._update_algo_state_dicts()
         self._worker_load_state_dicts_network(self.algo.state_dicts_network())
@@ -398,7 +444,7 @@ class Synchron(SynchronEvalOnly, Agent):
         explore_episode_limit: Optional[int] = None,
         update_steps: Optional[int] = None,
         update_step_limit: Optional[int] = None,
-    ) -> Tuple[List[Episode], List[float]]:
+    ) -> Tuple[List[Episode], Dict[str, Any]]:
         t_start = perf_counter()
         update_steps_start = self.step_counter.update
         explore_steps_start = self.step_counter.exploration
@@ -415,7 +461,9 @@ class Synchron(SynchronEvalOnly, Agent):
         update_step_limit, _ = self._log_and_convert_limits(
             "update", update_steps, update_step_limit
         )
-        self.trainer.update(step_limit=update_step_limit)
+        self._sync_trainer_step_counters()
+        for trainer in self.trainers:
+            trainer.update(step_limit=update_step_limit)
 
         explore_step_limit, explore_episode_limit = self._log_and_convert_limits(
             "exploration",
@@ -489,13 +537,22 @@ class Synchron(SynchronEvalOnly, Agent):
     def close(self):
         for agent in self.worker:
             agent.close()
-        self.trainer.close()
+        for trainer in self.trainers:
+            trainer.close()
         self.replay_buffer.close()
 
         del self.worker
-        del self.trainer
+        del self.trainers
         del self.replay_buffer
 
+    def get_update_timings(self, reset: bool = True) -> Dict[str, Any]:
+        return self.trainer.get_update_timings(reset)
+
+    @property
+    def trainer(self) -> SingleAgentProcess:
+        # rank 0 owns the state published to the workers and checkpoints
+        return self.trainers[0]
+
     def _update_algo_state_dicts(self):
         state_dicts = self.algo.state_dicts_network()
         self.trainer.state_dicts_network(state_dicts)
@@ -522,9 +579,17 @@ class Synchron(SynchronEvalOnly, Agent):
         new_agent.load_state_dicts_network(self.algo.state_dicts_network())
         self.worker[agent.agent_id] = new_agent
         if task == "heatup":
-            new_agent.heatup(step_limit=step_limit, episode_limit=episode_limit)
+            new_agent.heatup(
+                step_limit=step_limit,
+                episode_limit=episode_limit,
+                episode_callback=self._episode_callback,
+            )
         elif task == "exploration":
-            new_agent.explore(step_limit=step_limit, episode_limit=episode_limit)
+            new_agent.explore(
+                step_limit=step_limit,
+                episode_limit=episode_limit,
+                episode_callback=self._episode_callback,
+            )
         elif task == "evaluation":
             i = agent.agent_id
             seeds = self._eval_seeds[i] if self._eval_seeds is not None else None
@@ -534,25 +599,68 @@ class Synchron(SynchronEvalOnly, Agent):
                 episode_limit=episode_limit,
                 seeds=seeds,
                 options=options,
+                episode_callback=self._episode_callback,
             )
         return new_agent
 
     def _get_trainer_results(self, timeout: Optional[float] = None):
-        result = self.trainer.get_result(timeout=timeout)
-        if isinstance(result, queue.Empty):
+        t_limit = perf_counter() + timeout if timeout is not None else inf
+        result = self._poll_trainer_result(self.trainer, t_limit)
+        if result is None:
             return None
+        # the other ranks finish the same steps, their loss stats are not used
+        t_limit_ranks = perf_counter() + DIST_TIMEOUT
+        for trainer in self.trainers[1:]:
+            if isinstance(result, Exception):
+                break
+            rank_result = self._poll_trainer_result(trainer, t_limit_ranks)
+            if rank_result is None:
+                rank_result = TimeoutError(
+                    f"no result from {trainer.name} within {DIST_TIMEOUT}s"
+                )
+            if isinstance(rank_result, Exception):
+                result = rank_result
         if isinstance(result, Exception):
             log_warn = f"Restaring Trainer because of Exception {result}"
             self.logger.warning(log_warn)
-            self.trainer.close()
-            self.trainer = self._create_trainer_agent()
-            self.trainer.load_state_dicts_network(self.algo.state_dicts_network())
-            self.trainer.load_state_dicts_optimizer(self.algo.state_dicts_optimizer())
-            self.trainer.load_state_dicts_scheduler(self.algo.state_dicts_scheduler())
+            self._restart_trainer_agents()
             self.update_error = True
-            return []
+            return {}
         return result
 
+    # None if t_limit is reached. A dead rank is an error of all ranks, the others
+    # would wait in the next all_reduce until the process group times out.
+    def _poll_trainer_result(self, trainer: SingleAgentProcess, t_limit: float):
+        while True:
+            timeout = max(min(1.0, t_limit - perf_counter()), 0.0)
+            result = trainer.get_result(timeout=timeout)
+            if not isinstance(result, queue.Empty):
+                return result
+            dead = [
+                trainer_.name for trainer_ in self.trainers if not trainer_.is_alive()
+            ]
+            if dead:
+                return RuntimeError(f"{dead} not alive anymore")
+            if perf_counter() >= t_limit:
+                return None
+
+    def _restart_trainer_agents(self):
+        # the process group only works with all ranks, so all trainers restart together
+        for trainer in self.trainers:
+            trainer.close()
+        self.trainers = self._create_trainer_agents()
+        self._trainer_load_state_dicts()
+
+    def _trainer_load_state_dicts(self):
+        for trainer in self.trainers:
+            trainer.load_state_dicts_network(self.algo.state_dicts_network())
+            trainer.load_state_dicts_optimizer(self.algo.state_dicts_optimizer())
+            trainer.load_state_dicts_scheduler(self.algo.state_dicts_scheduler())
+
+    def _sync_trainer_step_counters(self):
+        for trainer in self.trainers[1:]:
+            trainer.step_counter.update = self.step_counter.update
+
     def _create_worker_agent(self, i):
         return SingleAgentProcess(
             i,
@@ -568,11 +676,40 @@ class Synchron(SynchronEvalOnly, Agent):
             step_counter=self.step_counter,
             episode_counter=self.episode_counter,
             nice_level=10,
+            render_schedule=self.render_schedule,
+            episode_results=self.episode_results,
+            summary_info_keys=self.summary_info_keys,
         )
 
-    def _create_trainer_agent(self):
+    def _create_trainer_agents(self) -> List[SingleAgentProcess]:
+        if self.n_trainer == 1:
+            return [self._create_trainer_agent(0)]
+
+        init_method = f"tcp://127.0.0.1:{self._free_port()}"
+        trainers = []
+        for rank in range(self.n_trainer):
+            dist_init = {
+                "init_method": init_method,
+                "rank": rank,
+                "world_size": self.n_trainer,
+            }
+            trainers.append(self._create_trainer_agent(rank, dist_init))
+        return trainers
+
+    def _create_trainer_agent(
+        self, rank: int, dist_init: Optional[Dict[str, Any]] = None
+    ):
+        # only rank 0 counts the update steps of the synchron agent
+        if rank == 0:
+            name = "trainer_synchron"
+            step_counter = self.step_counter
+            episode_counter = self.episode_counter
+        else:
+            name = f"trainer_synchron_{rank}"
+            step_counter = StepCounterShared()
+            episode_counter = EpisodeCounterShared()
         return SingleAgentProcess(
-            0,
+            rank,
             deepcopy(self.algo),
             DummyEnv(),
             DummyEnv(),
@@ -580,18 +717,24 @@ class Synchron(SynchronEvalOnly, Agent):
             self.trainer_device,
             0,
             self.normalize_actions,
-            name="trainer_synchron",
+            name=name,
             parent_agent=self,
-            step_counter=self.step_counter,
-            episode_counter=self.episode_counter,
+            step_counter=step_counter,
+            episode_counter=episode_counter,
             nice_level=0,
+            update_stack_size=self.update_stack_size,
+            dist_init=dist_init,
         )
 
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
     def load_checkpoint(self, file_path: str) -> None:
         super().load_checkpoint(file_path)
-        self.trainer.load_state_dicts_network(self.algo.state_dicts_network())
-        self.trainer.load_state_dicts_optimizer(self.algo.state_dicts_optimizer())
-        self.trainer.load_state_dicts_scheduler(self.algo.state_dicts_scheduler())
+        self._trainer_load_state_dicts()
 
     @classmethod
     def from_checkpoint(  # pylint: disable=arguments-renamed
@@ -606,6 +749,11 @@ class Synchron(SynchronEvalOnly, Agent):
         env_train: Optional[gym.Env] = None,
         env_eval: Optional[gym.Env] = None,
         replay_buffer: Optional[ReplayBuffer] = None,
+        update_stack_size: int = 1,
+        n_trainer: int = 1,
+        render_schedule: Union[str, int] = "always",
+        episode_results: str = "full",
+        summary_info_keys: Optional[List[str]] = None,
     ):
         cp = torch.load(checkpoint_path)
         confighandler = ConfigHandler()
@@ -628,6 +776,11 @@ class Synchron(SynchronEvalOnly, Agent):
             consecutive_action_steps,
             normalize_actions,
             timeout_worker_after_reaching_limit,
+            update_stack_size,
+            n_trainer,
+            render_schedule,
+            episode_results,
+            summary_info_keys,
         )
         agent.load_checkpoint(checkpoint_path)
         return agent
@@ -1,2 +1,3 @@
 from .algo import Algo, AlgoPlayOnly
 from .sac import SAC, SACPlayOnly
+from .sacinference import SACInference
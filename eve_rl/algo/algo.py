@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, List, Dict, Optional
+from typing import Any, Dict, List, Optional
 import numpy as np
 import torch
 from ..replaybuffer import Batch
@@ -23,7 +23,15 @@ class AlgoPlayOnly(EveRLObject, ABC):
         ...
 
     @abstractmethod
-    def reset(self) -> None:
+    def get_exploration_action_batch(self, flat_states: np.ndarray) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def get_eval_action_batch(self, flat_states: np.ndarray) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
         ...
 
     def to(self, device: torch.device):
@@ -71,9 +79,25 @@ class Algo(EveRLObject, ABC):
         return self.model.load_state_dicts_scheduler(state_dicts)
 
     @abstractmethod
-    def update(self, batch: Batch) -> List[float]:
+    def update(self, batch: Batch) -> None:
+        ...
+
+    def update_stack(self, batch: Batch) -> None:
+        # one update per batch stacked in the first dimension
+        for i in range(batch.actions.shape[0]):
+            self.update(
+                Batch(*[entry[i] if entry is not None else None for entry in batch])
+            )
+
+    @abstractmethod
+    def get_loss_stats(self, reset: bool = True) -> Dict[str, Any]:
         ...
 
+    def get_update_timings(  # pylint: disable=unused-argument
+        self, reset: bool = True
+    ) -> Dict[str, Any]:
+        return {}
+
     @abstractmethod
     def get_exploration_action(self, flat_state: np.ndarray) -> np.ndarray:
         ...
@@ -83,7 +107,15 @@ class Algo(EveRLObject, ABC):
         ...
 
     @abstractmethod
-    def reset(self) -> None:
+    def get_exploration_action_batch(self, flat_states: np.ndarray) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def get_eval_action_batch(self, flat_states: np.ndarray) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
         ...
 
     @abstractmethod
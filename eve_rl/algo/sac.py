@@ -1,12 +1,21 @@
-from typing import Tuple
+from contextlib import ExitStack, nullcontext
+from math import inf
+from typing import Any, Dict, List, Optional, Tuple
 import logging
+import os
 import numpy as np
 from torch.distributions import Normal
 import torch
-import torch.nn.functional as F
+import torch.distributed as dist
 from .algo import Algo, AlgoPlayOnly
 from ..model import SACModel, SACModelPlayOnly
 from ..replaybuffer import Batch
+from ..util import PhaseTimer
+
+
+def _check_precision(precision: str):
+    if precision not in ["float32", "bfloat16"]:
+        raise ValueError(f"{precision=} must be 'float32' or 'bfloat16'")
 
 
 class SACPlayOnly(AlgoPlayOnly):
@@ -19,6 +28,8 @@ class SACPlayOnly(AlgoPlayOnly):
         action_scaling: float = 1,
         exploration_action_noise: float = 0.25,
         stochastic_eval: bool = False,
+        precision: str = "float32",
+        autocast_exclude: Optional[List[str]] = None,
     ):
         self.logger = logging.getLogger(self.__module__)
         # HYPERPARAMETERS
@@ -30,47 +41,84 @@ class SACPlayOnly(AlgoPlayOnly):
         # REST
         self.action_scaling = action_scaling
         self.stochastic_eval = stochastic_eval
+        self.precision = precision
+        self.autocast_exclude = autocast_exclude or []
+        _check_precision(precision)
 
         self.device = torch.device("cpu")
 
     def get_exploration_action(self, flat_state: np.ndarray) -> np.ndarray:
+        return self.get_exploration_action_batch(np.expand_dims(flat_state, 0))[0]
+
+    def get_eval_action(self, flat_state: np.ndarray) -> np.ndarray:
+        return self.get_eval_action_batch(np.expand_dims(flat_state, 0))[0]
+
+    def get_exploration_action_batch(self, flat_states: np.ndarray) -> np.ndarray:
         with torch.no_grad():
-            torch_state = torch.as_tensor(
-                flat_state, dtype=torch.float32, device=self.device
+            torch_states = torch.as_tensor(
+                flat_states, dtype=torch.float32, device=self.device
             )
-            torch_state = torch_state.unsqueeze(0).unsqueeze(0)
-            mean, log_std = self.model.policy.forward_play(torch_state)
+            # every row is a sequence of length 1
+            torch_states = torch_states.unsqueeze(1)
+            mean, log_std = self._forward_play("policy", torch_states)
             std = log_std.exp()
             normal = Normal(mean, std)
-            action = torch.tanh(normal.sample())
-            action = action.squeeze(0).squeeze(0).cpu().detach().numpy()
-            action += np.random.normal(0, self.exploration_action_noise)
-        return action
+            actions = torch.tanh(normal.sample())
+            actions = actions.squeeze(1).cpu().numpy()
+            actions += np.random.normal(
+                0, self.exploration_action_noise, (actions.shape[0], 1)
+            )
+        return actions
 
-    def get_eval_action(self, flat_state: np.ndarray) -> np.ndarray:
+    def get_eval_action_batch(self, flat_states: np.ndarray) -> np.ndarray:
         with torch.no_grad():
-            torch_state = torch.as_tensor(
-                flat_state, dtype=torch.float32, device=self.device
+            torch_states = torch.as_tensor(
+                flat_states, dtype=torch.float32, device=self.device
             )
-            torch_state = torch_state.unsqueeze(0).unsqueeze(0)
-            mean, log_std = self.model.policy.forward_play(torch_state)
+            torch_states = torch_states.unsqueeze(1)
+            mean, log_std = self._forward_play("policy", torch_states)
             if self.stochastic_eval:
                 std = log_std.exp()
                 normal = Normal(mean, std)
-                action = torch.tanh(normal.sample())
+                actions = torch.tanh(normal.sample())
             else:
-                mean, _ = self.model.policy.forward_play(torch_state)
-                action = torch.tanh(mean)
-
-            action = action.squeeze(0).squeeze(0).cpu().detach().numpy()
-        return action * self.action_scaling
+                actions = torch.tanh(mean)
+
+            actions = actions.squeeze(1).cpu().numpy()
+        return actions * self.action_scaling
+
+    def _forward_play(self, network_name: str, *args):
+        network = getattr(self.model, network_name)
+        if network_name == "policy" and self.model.quantize:
+            # int8 kernels take float32 inputs, autocast does not apply
+            return self.model.policy_quantized.forward_play(*args)
+        if self.precision == "float32" or network_name in self.autocast_exclude:
+            return network.forward_play(*args)
+        with torch.autocast(self.device.type, dtype=getattr(torch, self.precision)):
+            output = network.forward_play(*args)
+        return tuple(entry.float() for entry in output)
+
+    # action error of the quantized policy against the float policy on a reference batch
+    def quantization_error(self, flat_states: np.ndarray) -> Dict[str, float]:
+        if not self.model.quantize:
+            raise ValueError(f"{self.model.quantize=}, no quantized policy to check")
+        with torch.no_grad():
+            torch_states = torch.as_tensor(
+                flat_states, dtype=torch.float32, device=self.device
+            )
+            torch_states = torch_states.unsqueeze(1)
+            mean, _ = self.model.policy.forward(torch_states)
+            mean_quantized, _ = self.model.policy_quantized.forward(torch_states)
+            error = torch.tanh(mean) - torch.tanh(mean_quantized)
+            error = error.abs() * self.action_scaling
+        return {"mean": error.mean().item(), "max": error.max().item()}
 
     def to(self, device: torch.device):
         super().to(device)
         self.model.to(device)
 
-    def reset(self) -> None:
-        self.model.reset()
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
+        self.model.reset(batch_indices)
 
     def close(self):
         self.model.close()
@@ -89,12 +137,24 @@ class SAC(Algo):
         action_scaling: float = 1,
         exploration_action_noise: float = 0.25,
         stochastic_eval: bool = False,
+        target_update_interval: int = 1,
+        compile_update: bool = False,
+        compile_cache_dir: Optional[str] = None,
+        precision: str = "float32",
+        autocast_exclude: Optional[List[str]] = None,
+        policy_update_interval: int = 1,
+        time_phases: bool = False,
+        synchronize_timing: bool = False,
+        quantize_play_only: bool = False,
+        pack_sequences: bool = False,
     ):
         self.logger = logging.getLogger(self.__module__)
         # HYPERPARAMETERS
         self.n_actions = n_actions
         self.gamma = gamma
         self.tau = tau
+        self.target_update_interval = target_update_interval
+        self.policy_update_interval = policy_update_interval
         self.exploration_action_noise = exploration_action_noise
         # Model
         self.model = model
@@ -103,47 +163,114 @@ class SAC(Algo):
         self.reward_scaling = reward_scaling
         self.action_scaling = action_scaling
         self.stochastic_eval = stochastic_eval
+        self.compile_update = compile_update
+        self.compile_cache_dir = compile_cache_dir
+        self.precision = precision
+        self.autocast_exclude = autocast_exclude or []
+        self.quantize_play_only = quantize_play_only
+        self.pack_sequences = pack_sequences
+        _check_precision(precision)
 
         self.device = torch.device("cpu")
         self.update_step = 0
+        self.n_skipped_steps = 0
+        self._compiled = {}
+        self.time_phases = time_phases
+        self.synchronize_timing = synchronize_timing
+        self._timer = PhaseTimer(time_phases, synchronize_timing, self.device)
 
         # ENTROPY TEMPERATURE
         self.alpha = torch.ones(1)
         self.target_entropy = -torch.ones(1) * n_actions
 
+        # LOSS STATISTICS
+        self._loss_names = ["q1", "q2", "policy"]
+        self._reset_loss_stats()
+
     def get_exploration_action(self, flat_state: np.ndarray) -> np.ndarray:
+        return self.get_exploration_action_batch(np.expand_dims(flat_state, 0))[0]
+
+    def get_eval_action(self, flat_state: np.ndarray) -> np.ndarray:
+        return self.get_eval_action_batch(np.expand_dims(flat_state, 0))[0]
+
+    def get_exploration_action_batch(self, flat_states: np.ndarray) -> np.ndarray:
         with torch.no_grad():
-            torch_state = torch.as_tensor(
-                flat_state, dtype=torch.float32, device=self.device
+            torch_states = torch.as_tensor(
+                flat_states, dtype=torch.float32, device=self.device
             )
-            torch_state = torch_state.unsqueeze(0).unsqueeze(0)
-            mean, log_std = self.model.policy.forward_play(torch_state)
+            # every row is a sequence of length 1
+            torch_states = torch_states.unsqueeze(1)
+            mean, log_std = self._forward_play("policy", torch_states)
             std = log_std.exp()
             normal = Normal(mean, std)
-            action = torch.tanh(normal.sample())
-            action = action.squeeze(0).squeeze(0).cpu().detach().numpy()
-            action += np.random.normal(0, self.exploration_action_noise)
-        return action
+            actions = torch.tanh(normal.sample())
+            actions = actions.squeeze(1).cpu().numpy()
+            actions += np.random.normal(
+                0, self.exploration_action_noise, (actions.shape[0], 1)
+            )
+        return actions
 
-    def get_eval_action(self, flat_state: np.ndarray) -> np.ndarray:
+    def get_eval_action_batch(self, flat_states: np.ndarray) -> np.ndarray:
         with torch.no_grad():
-            torch_state = torch.as_tensor(
-                flat_state, dtype=torch.float32, device=self.device
+            torch_states = torch.as_tensor(
+                flat_states, dtype=torch.float32, device=self.device
             )
-            torch_state = torch_state.unsqueeze(0).unsqueeze(0)
-            mean, log_std = self.model.policy.forward_play(torch_state)
+            torch_states = torch_states.unsqueeze(1)
+            mean, log_std = self._forward_play("policy", torch_states)
             if self.stochastic_eval:
                 std = log_std.exp()
                 normal = Normal(mean, std)
-                action = torch.tanh(normal.sample())
+                actions = torch.tanh(normal.sample())
             else:
-                mean, _ = self.model.policy.forward_play(torch_state)
-                action = torch.tanh(mean)
-
-            action = action.squeeze(0).squeeze(0).cpu().detach().numpy()
-        return action * self.action_scaling
-
-    def update(self, batch: Batch) -> Tuple[float, float, float]:
+                actions = torch.tanh(mean)
+
+            actions = actions.squeeze(1).cpu().numpy()
+        return actions * self.action_scaling
+
+    def _forward_play(self, network_name: str, *args):
+        network = getattr(self.model, network_name)
+        if network_name == "policy" and self.model.encoder is not None:
+            # actions from observations, the shared encoder is the policy head
+            network = self.model.encoder_policy
+        if self.precision == "float32" or network_name in self.autocast_exclude:
+            return network.forward_play(*args)
+        with torch.autocast(self.device.type, dtype=getattr(torch, self.precision)):
+            output = network.forward_play(*args)
+        return tuple(entry.float() for entry in output)
+
+    def _forward(self, network_name: str, *args, **kwds):
+        network = getattr(self.model, network_name)
+        if self.precision == "float32" or network_name in self.autocast_exclude:
+            return network(*args, **kwds)
+        # float32 master weights, only the forward and backward run in lower precision
+        with torch.autocast(self.device.type, dtype=getattr(torch, self.precision)):
+            output = network(*args, **kwds)
+        if isinstance(output, tuple):
+            return tuple(entry.float() for entry in output)
+        return output.float()
+
+    def update(self, batch: Batch) -> None:
+        with self._timer.phase("transfer"):
+            batch = self._batch_to_device(batch)
+        with self._compile_cache():
+            self._update(*batch)
+
+    def update_stack(self, batch: Batch) -> None:
+        # transfer and conversion once for all stacked batches
+        with self._timer.phase("transfer"):
+            batch = self._batch_to_device(batch)
+        (all_states, actions, rewards, dones, padding_mask) = batch
+        with self._compile_cache():
+            for i in range(actions.shape[0]):
+                self._update(
+                    all_states[i],
+                    actions[i],
+                    rewards[i],
+                    dones[i],
+                    padding_mask[i] if padding_mask is not None else None,
+                )
+
+    def _batch_to_device(self, batch: Batch) -> Batch:
         (all_states, actions, rewards, dones, padding_mask) = batch
         # actions /= self.action_scaling
 
@@ -154,111 +281,344 @@ class SAC(Algo):
 
         if padding_mask is not None:
             padding_mask = padding_mask.to(dtype=torch.float32, device=self.device)
+        return Batch(all_states, actions, rewards, dones, padding_mask)
 
+    def _update(
+        self,
+        all_states: torch.Tensor,
+        actions: torch.Tensor,
+        rewards: torch.Tensor,
+        dones: torch.Tensor,
+        padding_mask: torch.Tensor,
+    ) -> None:
         seq_length = actions.shape[1]
-        states = torch.narrow(all_states, dim=1, start=0, length=seq_length)
-
-        # use all_states for next_actions and next_log_pi for proper hidden_state initilaization
-        expected_q = self._get_expected_q(
-            all_states, rewards, dones, padding_mask, seq_length
+        update_policy = (self.update_step + 1) % self.policy_update_interval == 0
+
+        lengths = all_lengths = None
+        if self.pack_sequences and padding_mask is not None:
+            # recurrent components skip padded steps, all_states have the next state.
+            # Pays off with cudnn, on the cpu packed LSTMs are slower than padded ones
+            lengths = padding_mask.sum(dim=1).flatten().to("cpu", torch.int64)
+            all_lengths = lengths + 1
+
+        all_critic_states = all_policy_states = all_target_states = all_states
+        if self.model.encoder is not None:
+            encoder_gradient = self.model.encoder_gradient
+            with self._timer.phase("encoder"), torch.set_grad_enabled(
+                encoder_gradient == "critic"
+                or (encoder_gradient == "policy" and update_policy)
+            ):
+                all_encoded = self._run_loss_fn(self._encode, all_states, all_lengths)
+            # one encoder forward for all networks, gradients only from the chosen loss
+            all_target_states = all_encoded.detach()
+            all_critic_states = all_policy_states = all_target_states
+            if encoder_gradient == "critic":
+                all_critic_states = all_encoded
+            elif encoder_gradient == "policy":
+                all_policy_states = all_encoded
+        states = torch.narrow(all_critic_states, dim=1, start=0, length=seq_length)
+        policy_states = torch.narrow(
+            all_policy_states, dim=1, start=0, length=seq_length
         )
 
-        # q1 update
-        q1_loss = self._update_q1(actions, padding_mask, states, expected_q)
-
-        # q2 update
-        q2_loss = self._update_q2(actions, padding_mask, states, expected_q)
-
-        log_pi, policy_loss = self._update_policy(padding_mask, states)
-
-        self.model.update_target_q(self.tau)
+        # one policy forward over all_states (proper hidden_state initilaization),
+        # detached for the targets, the prefix of states for the policy loss.
+        # Without policy update no graph is needed.
+        with self._timer.phase("policy_forward"), torch.set_grad_enabled(update_policy):
+            all_new_actions, all_log_pi = self._run_loss_fn(
+                self._get_update_action, all_policy_states, all_lengths
+            )
 
-        self._update_alpha(log_pi)
+        with self._timer.phase("target"):
+            expected_q = self._run_loss_fn(
+                self._get_expected_q,
+                all_target_states,
+                rewards,
+                dones,
+                padding_mask,
+                self.alpha,
+                all_new_actions.detach(),
+                all_log_pi.detach(),
+                all_lengths,
+            )
+        with self._timer.phase("critic_forward"):
+            q_losses = self._run_loss_fn(
+                self._q_loss, states, actions, padding_mask, expected_q, lengths
+            )
+        with self._timer.phase("critic_backward"):
+            self._update_q(q_losses)
+
+        policy_loss = None
+        if update_policy:
+            with self._timer.phase("policy_loss"):
+                new_actions = torch.narrow(
+                    all_new_actions, dim=1, start=0, length=seq_length
+                )
+                log_pi = torch.narrow(all_log_pi, dim=1, start=0, length=seq_length)
+                log_pi, policy_loss = self._run_loss_fn(
+                    self._policy_loss,
+                    policy_states,
+                    new_actions,
+                    log_pi,
+                    padding_mask,
+                    self.alpha,
+                    lengths,
+                )
+            with self._timer.phase("policy_backward"):
+                self._update_policy(policy_loss)
+            with self._timer.phase("alpha"):
+                self._update_alpha(log_pi)
+
+        if (self.update_step + 1) % self.target_update_interval == 0:
+            with self._timer.phase("target_update"):
+                # same decay as updating every step while the critics stay unchanged
+                tau = 1 - (1 - self.tau) ** self.target_update_interval
+                self.model.update_target_q(tau)
 
         self.update_step += 1
-        return [
-            q1_loss.detach().cpu().numpy(),
-            q2_loss.detach().cpu().numpy(),
-            policy_loss.detach().cpu().numpy(),
-        ]
+        self._add_loss_stats(q_losses, policy_loss)
+
+    def _run_loss_fn(self, loss_fn, *args):
+        if not self.compile_update:
+            return loss_fn(*args)
+
+        shapes = tuple(arg.shape if arg is not None else None for arg in args)
+        name = loss_fn.__name__
+        if name not in self._compiled:
+            self._compiled[name] = (shapes, torch.compile(loss_fn, dynamic=False))
+        compiled_shapes, compiled_fn = self._compiled[name]
+        if shapes != compiled_shapes:
+            # e.g. other sequence lengths from episode replay, eager instead of recompiling
+            return loss_fn(*args)
+        return compiled_fn(*args)
+
+    # Restarted trainers load the compiled graphs instead of compiling again. The
+    # cache flags only apply during the update (backward included). The inductor
+    # cache location is the TORCHINDUCTOR_CACHE_DIR environment variable and stays
+    # set for the whole process, other torch.compile users share the cache dir.
+    def _compile_cache(self):
+        if not self.compile_update or self.compile_cache_dir is None:
+            return nullcontext()
+        # pylint: disable=import-outside-toplevel
+        import torch._functorch.config as functorch_config
+        import torch._inductor.config as inductor_config
+
+        cache_dir = os.path.abspath(self.compile_cache_dir)
+        previous_cache_dir = os.environ.get("TORCHINDUCTOR_CACHE_DIR")
+        if previous_cache_dir != cache_dir:
+            log_info = f"Setting TORCHINDUCTOR_CACHE_DIR={cache_dir} for this process (was {previous_cache_dir})"
+            self.logger.info(log_info)
+            os.environ["TORCHINDUCTOR_CACHE_DIR"] = cache_dir
+        cache_context = ExitStack()
+        cache_context.enter_context(inductor_config.patch(fx_graph_cache=True))
+        cache_context.enter_context(functorch_config.patch(enable_autograd_cache=True))
+        return cache_context
+
+    def get_loss_stats(self, reset: bool = True) -> Dict[str, Any]:
+        if not self._loss_counts[0]:
+            return {}
+        # single device sync for all statistics
+        loss_counts = torch.tensor(self._loss_counts, device=self.device)
+        stats = torch.stack(
+            [self._loss_sum / loss_counts, self._loss_min, self._loss_max]
+        ).tolist()
+        loss_stats = {"count": self._loss_counts[0]}
+        for stat_name, values in zip(["mean", "min", "max"], stats):
+            # losses of updates that did not run yet (policy_update_interval) are left out
+            loss_stats[stat_name] = {
+                name: value
+                for name, value, count in zip(
+                    self._loss_names, values, self._loss_counts
+                )
+                if count
+            }
+        if reset:
+            self._reset_loss_stats()
+        return loss_stats
+
+    def get_update_timings(self, reset: bool = True) -> Dict[str, Any]:
+        return self._timer.get_timings(reset)
+
+    def _add_loss_stats(self, q_losses: torch.Tensor, policy_loss: torch.Tensor):
+        losses = q_losses.detach()
+        if policy_loss is not None:
+            losses = torch.cat([losses, policy_loss.detach().view(1)])
+        # q losses first, the policy loss is only added on policy updates
+        n_losses = losses.shape[0]
+        self._loss_sum[:n_losses] += losses
+        loss_min = self._loss_min[:n_losses]
+        loss_max = self._loss_max[:n_losses]
+        torch.minimum(loss_min, losses, out=loss_min)
+        torch.maximum(loss_max, losses, out=loss_max)
+        for i in range(n_losses):
+            self._loss_counts[i] += 1
+
+    def _reset_loss_stats(self):
+        n_losses = len(self._loss_names)
+        self._loss_counts = [0] * n_losses
+        self._loss_sum = torch.zeros(n_losses, device=self.device)
+        self._loss_min = torch.full((n_losses,), inf, device=self.device)
+        self._loss_max = torch.full((n_losses,), -inf, device=self.device)
 
     def _update_alpha(self, log_pi):
         alpha_loss = (
             self.model.log_alpha * (-log_pi - self.target_entropy).detach()
         ).mean()
-        self.model.alpha_optimizer.zero_grad()
-        alpha_loss.backward()
-        self.model.alpha_optimizer.step()
-
-        self.alpha = self.model.log_alpha.exp()
+        self._step_optimizers(alpha_loss, [self.model.alpha_optimizer], [])
+
+        self.alpha = self.model.log_alpha.exp().detach()
+
+    def _update_policy(self, policy_loss):
+        optimizers = [self.model.policy_optimizer]
+        if self.model.encoder is not None and self.model.encoder_gradient == "policy":
+            optimizers.append(self.model.encoder_optimizer)
+        self._step_optimizers(
+            policy_loss,
+            optimizers,
+            [self.model.policy_scheduler],
+        )
 
-    def _update_policy(self, padding_mask, states):
-        new_actions, log_pi = self._get_update_action(states)
-        q1 = self.model.q1(states, new_actions)
-        q2 = self.model.q2(states, new_actions)
-        min_q = torch.min(q1, q2)
+    def _update_q(self, q_losses):
+        # the critics share no parameters, the sum gives each critic its own gradient
+        optimizers = [self.model.q1_optimizer, self.model.q2_optimizer]
+        if self.model.encoder is not None and self.model.encoder_gradient == "critic":
+            # with a shared encoder its gradient is the sum of both critics
+            optimizers.append(self.model.encoder_optimizer)
+        self._step_optimizers(
+            q_losses.sum(),
+            optimizers,
+            [self.model.q1_scheduler, self.model.q2_scheduler],
+        )
 
-        if padding_mask is not None:
-            min_q *= padding_mask
-            log_pi *= padding_mask
+    def _step_optimizers(self, loss, optimizers, schedulers):
+        for optimizer in optimizers:
+            optimizer.zero_grad()
+        loss.backward()
+        if dist.is_available() and dist.is_initialized():
+            self._all_reduce_grads(optimizers)
+        if self.precision == "float32" or self._grads_finite(optimizers):
+            for optimizer in optimizers:
+                optimizer.step()
+        else:
+            self.n_skipped_steps += 1
+            self.logger.warning(
+                f"Non-finite gradients at {self.update_step=}, optimizer step skipped"
+            )
+        for scheduler in schedulers:
+            if scheduler:
+                scheduler.step()
+
+    def _all_reduce_grads(self, optimizers):
+        # data parallel trainers, mean gradient of all minibatches in one all_reduce
+        world_size = dist.get_world_size()
+        if world_size == 1:
+            return
+        grads = self._grads(optimizers)
+        flat_grads = torch.cat([grad.flatten() for grad in grads])
+        dist.all_reduce(flat_grads)
+        flat_grads /= world_size
+        offset = 0
+        for grad in grads:
+            grad.copy_(flat_grads[offset : offset + grad.numel()].view_as(grad))
+            offset += grad.numel()
+
+    def _grads_finite(self, optimizers) -> bool:
+        grads = self._grads(optimizers)
+        found_inf = torch.zeros(1, device=self.device)
+        torch._amp_foreach_non_finite_check_and_unscale_(
+            grads, found_inf, torch.ones(1, device=self.device)
+        )
+        return not found_inf.item()
 
-        policy_loss = (self.alpha * log_pi - min_q).mean()
+    @staticmethod
+    def _grads(optimizers) -> List[torch.Tensor]:
+        return [
+            param.grad
+            for optimizer in optimizers
+            for group in optimizer.param_groups
+            for param in group["params"]
+            if param.grad is not None
+        ]
 
-        self.model.policy_optimizer.zero_grad()
-        policy_loss.backward()
-        self.model.policy_optimizer.step()
-        if self.model.policy_scheduler:
-            self.model.policy_scheduler.step()
-        return log_pi, policy_loss
+    def _policy_loss(self, states, new_actions, log_pi, padding_mask, alpha, lengths):
+        if self.model.fused_critic:
+            min_q = self._forward(
+                "q_ensemble", states, new_actions, lengths=lengths
+            ).amin(dim=0)
+        else:
+            q1 = self._forward("q1", states, new_actions, lengths=lengths)
+            q2 = self._forward("q2", states, new_actions, lengths=lengths)
+            min_q = torch.min(q1, q2)
 
-    def _update_q2(self, actions, padding_mask, states, expected_q):
-        curr_q2 = self.model.q2(states, actions)
-        if padding_mask is not None:
-            curr_q2 *= padding_mask
-        q2_loss = F.mse_loss(curr_q2, expected_q.detach())
-
-        self.model.q2_optimizer.zero_grad()
-        q2_loss.backward()
-        self.model.q2_optimizer.step()
-        if self.model.q2_scheduler:
-            self.model.q2_scheduler.step()
-        return q2_loss
-
-    def _update_q1(self, actions, padding_mask, states, expected_q):
-        curr_q1 = self.model.q1(states, actions)
         if padding_mask is not None:
-            curr_q1 *= padding_mask
-        q1_loss = F.mse_loss(curr_q1, expected_q.detach())
+            min_q = min_q * padding_mask
+            log_pi = log_pi * padding_mask
 
-        self.model.q1_optimizer.zero_grad()
-        q1_loss.backward()
-        self.model.q1_optimizer.step()
-        if self.model.q1_scheduler:
-            self.model.q1_scheduler.step()
-        return q1_loss
+        policy_loss = (alpha * log_pi - min_q).mean()
+        return log_pi, policy_loss
 
-    def _get_expected_q(self, all_states, rewards, dones, padding_mask, seq_length):
-        next_actions, next_log_pi = self._get_update_action(all_states)
+    def _q_loss(self, states, actions, padding_mask, expected_q, lengths):
+        if self.model.fused_critic:
+            curr_q = self._forward("q_ensemble", states, actions, lengths=lengths)
+        else:
+            curr_q1 = self._forward("q1", states, actions, lengths=lengths)
+            curr_q2 = self._forward("q2", states, actions, lengths=lengths)
+            curr_q = torch.stack([curr_q1, curr_q2])
+        if padding_mask is not None:
+            curr_q = curr_q * padding_mask
+        # one mse per critic
+        q_losses = (curr_q - expected_q).pow(2).flatten(1).mean(dim=1)
+        return q_losses
 
+    def _get_expected_q(
+        self,
+        all_states,
+        rewards,
+        dones,
+        padding_mask,
+        alpha,
+        next_actions,
+        next_log_pi,
+        all_lengths,
+    ):
+        seq_length = rewards.shape[1]
         with torch.no_grad():
-            next_target_q1 = self.model.target_q1(all_states, next_actions)
-            next_target_q2 = self.model.target_q2(all_states, next_actions)
-
-        next_target_q = (
-            torch.min(next_target_q1, next_target_q2) - self.alpha * next_log_pi
-        )
-        # only use next_state for next_q_target
-        next_target_q = torch.narrow(next_target_q, dim=1, start=1, length=seq_length)
-        expected_q = rewards + (1 - dones) * self.gamma * next_target_q
-        if padding_mask is not None:
-            expected_q *= padding_mask
+            if self.model.fused_critic:
+                next_target_q = self._forward(
+                    "target_q_ensemble", all_states, next_actions, lengths=all_lengths
+                ).amin(dim=0)
+            else:
+                next_target_q1 = self._forward(
+                    "target_q1", all_states, next_actions, lengths=all_lengths
+                )
+                next_target_q2 = self._forward(
+                    "target_q2", all_states, next_actions, lengths=all_lengths
+                )
+                next_target_q = torch.min(next_target_q1, next_target_q2)
+
+            next_target_q = next_target_q - alpha * next_log_pi
+            # only use next_state for next_q_target
+            next_target_q = torch.narrow(
+                next_target_q, dim=1, start=1, length=seq_length
+            )
+            expected_q = rewards + (1 - dones) * self.gamma * next_target_q
+            if padding_mask is not None:
+                expected_q = expected_q * padding_mask
         return expected_q
 
+    def _encode(
+        self, all_states: torch.Tensor, all_lengths: Optional[torch.Tensor]
+    ) -> torch.Tensor:
+        return self._forward("encoder", all_states, lengths=all_lengths)
+
     # epsilon makes sure that log(0) does not occur
     def _get_update_action(
-        self, state_batch: torch.Tensor, epsilon: float = 1e-6
+        self,
+        state_batch: torch.Tensor,
+        lengths: Optional[torch.Tensor] = None,
+        epsilon: float = 1e-6,
     ) -> Tuple[torch.Tensor, torch.Tensor]:
-        mean_batch, log_std = self.model.policy(state_batch)
+        mean_batch, log_std = self._forward("policy", state_batch, lengths=lengths)
         std_batch = log_std.exp()
 
         normal = Normal(mean_batch, std_batch)
@@ -277,18 +637,31 @@ class SAC(Algo):
         super().to(device)
         self.alpha = self.alpha.to(device)
         self.target_entropy = self.target_entropy.to(device)
+        self._loss_sum = self._loss_sum.to(device)
+        self._loss_min = self._loss_min.to(device)
+        self._loss_max = self._loss_max.to(device)
         self.model.to(device)
+        self._compiled = {}
+        self._timer.device = device
 
-    def reset(self) -> None:
-        self.model.reset()
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
+        self.model.reset(batch_indices)
 
     def close(self):
         self.model.close()
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # compiled functions can't be pickled, they are compiled again on the next update
+        state["_compiled"] = {}
+        return state
+
     def to_play_only(self):
         return SACPlayOnly(
-            self.model.to_play_only(),
+            self.model.to_play_only(self.quantize_play_only),
             self.n_actions,
             self.action_scaling,
             self.exploration_action_noise,
+            precision=self.precision,
+            autocast_exclude=self.autocast_exclude,
         )
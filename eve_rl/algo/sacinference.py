@@ -0,0 +1,87 @@
+from typing import Tuple, Union
+import numpy as np
+import torch
+from .sac import SAC, SACPlayOnly
+
+
+# Single observation inference with preallocated buffers. Create it after the
+# algo is moved to its device, it shares the policy (and its hidden state) with the algo.
+class SACInference:
+    def __init__(self, algo: Union[SAC, SACPlayOnly]) -> None:
+        self.algo = algo
+        self.policy = algo.model.policy
+        if isinstance(algo, SAC) and algo.model.encoder is not None:
+            self.policy = algo.model.encoder_policy
+        quantized = isinstance(algo, SACPlayOnly) and algo.model.quantize
+        if quantized:
+            self.policy = algo.model.policy_quantized
+        self.device = algo.device
+        self.action_scaling = algo.action_scaling
+        self.exploration_action_noise = algo.exploration_action_noise
+        self.stochastic_eval = algo.stochastic_eval
+        self.autocast_dtype = None
+        if (
+            algo.precision != "float32"
+            and "policy" not in algo.autocast_exclude
+            and not quantized
+        ):
+            self.autocast_dtype = getattr(torch, algo.precision)
+
+        n_observations = self.policy.n_observations
+        n_actions = self.policy.n_actions
+        self._obs = torch.zeros(
+            (1, 1, n_observations), dtype=torch.float32, device=self.device
+        )
+        self._noise = torch.zeros(
+            (1, 1, n_actions), dtype=torch.float32, device=self.device
+        )
+        self._action = torch.zeros(
+            (1, 1, n_actions), dtype=torch.float32, device=self.device
+        )
+        if self.device.type == "cpu":
+            self._action_host = self._action
+        else:
+            self._action_host = torch.zeros(
+                (1, 1, n_actions), dtype=torch.float32, pin_memory=True
+            )
+        self._action_np = self._action_host.view(-1).numpy()
+
+    def get_exploration_action(self, flat_state: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            mean, log_std = self._forward(flat_state)
+            self._sample(mean, log_std)
+            action = self._action_to_numpy()
+        return action + np.random.normal(0, self.exploration_action_noise)
+
+    def get_eval_action(self, flat_state: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            mean, log_std = self._forward(flat_state)
+            if self.stochastic_eval:
+                self._sample(mean, log_std)
+            else:
+                torch.tanh(mean, out=self._action)
+            action = self._action_to_numpy()
+        return action * self.action_scaling
+
+    def reset(self) -> None:
+        self.algo.reset()
+
+    def _forward(self, flat_state: np.ndarray) -> Tuple[torch.Tensor, torch.Tensor]:
+        flat_state = torch.from_numpy(np.asarray(flat_state, dtype=np.float32))
+        self._obs.view(-1).copy_(flat_state)
+        if self.autocast_dtype is None:
+            return self.policy.forward_play(self._obs)
+        with torch.autocast(self.device.type, dtype=self.autocast_dtype):
+            mean, log_std = self.policy.forward_play(self._obs)
+        return mean.float(), log_std.float()
+
+    def _sample(self, mean: torch.Tensor, log_std: torch.Tensor) -> None:
+        # tanh(mean + std * noise), same as sampling from Normal(mean, std)
+        torch.randn(self._noise.shape, out=self._noise)
+        torch.tanh(torch.addcmul(mean, log_std.exp_(), self._noise), out=self._action)
+
+    # returns the buffer view, callers create the returned array
+    def _action_to_numpy(self) -> np.ndarray:
+        if self._action_host is not self._action:
+            self._action_host.copy_(self._action)
+        return self._action_np
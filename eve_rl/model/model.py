@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 import torch
 from ..util import EveRLObject
 
@@ -15,7 +15,7 @@ class ModelPlayOnly(EveRLObject, ABC):
         self.device = device
 
     @abstractmethod
-    def reset(self) -> None:
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
         ...
 
     @abstractmethod
@@ -60,7 +60,7 @@ class Model(EveRLObject, ABC):
         ...
 
     @abstractmethod
-    def reset(self) -> None:
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
         ...
 
     @abstractmethod
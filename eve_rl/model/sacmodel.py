@@ -1,6 +1,7 @@
 from copy import deepcopy
-from typing import Any, Dict, Iterator
-from torch import optim
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+from torch import nn, optim
 import torch
 from .model import Model, ModelPlayOnly
 from .. import network
@@ -10,21 +11,51 @@ class SACModelPlayOnly(ModelPlayOnly):
     def __init__(
         self,
         policy: network.GaussianPolicy,
+        quantize: bool = False,
     ) -> None:
         self.policy = policy
+        self.quantize = quantize
+        self.policy_quantized: network.GaussianPolicy = None
+        if quantize:
+            self._quantize_policy()
 
     def to(self, device: torch.device):
+        if self.quantize and device.type != "cpu":
+            raise ValueError(f"{self.quantize=} is only supported on cpu, {device=}")
         super().to(device)
         self.policy.to(device)
 
     def load_state_dicts_network(self, state_dicts: Dict[str, Any]) -> None:
-        self.policy.load_state_dict(state_dicts["policy"])
-
-    def reset(self) -> None:
-        self.policy.reset()
+        policy_state_dict = state_dicts["policy"]
+        if "encoder" in state_dicts:
+            # shared encoder of the SACModel is the head of the play only policy
+            policy_state_dict = dict(policy_state_dict)
+            for key, value in state_dicts["encoder"].items():
+                policy_state_dict["head." + key] = value
+        self.policy.load_state_dict(policy_state_dict)
+        if self.quantize:
+            self._quantize_policy()
+
+    def _quantize_policy(self):
+        # dynamic int8: weights are quantized here, activations on every forward
+        policy_quantized = torch.ao.quantization.quantize_dynamic(
+            deepcopy(self.policy), {nn.Linear, nn.LSTM}, dtype=torch.qint8
+        )
+        policy_quantized.eval()
+        if self.policy_quantized is None:
+            self.policy_quantized = policy_quantized
+        else:
+            # in place keeps the hidden state and references to the quantized policy
+            self.policy_quantized.load_state_dict(policy_quantized.state_dict())
+
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
+        self.policy.reset(batch_indices)
+        if self.policy_quantized is not None:
+            self.policy_quantized.reset(batch_indices)
 
     def close(self):
         del self.policy
+        del self.policy_quantized
 
 
 class SACModel(Model):
@@ -40,8 +71,16 @@ class SACModel(Model):
         q1_scheduler: torch.optim.lr_scheduler._LRScheduler = None,
         q2_scheduler: torch.optim.lr_scheduler._LRScheduler = None,
         policy_scheduler: torch.optim.lr_scheduler._LRScheduler = None,
+        fused_critic: bool = False,
+        encoder: Optional[network.component.Component] = None,
+        encoder_optimizer: Optional[torch.optim.Optimizer] = None,
+        encoder_gradient: str = "critic",
     ) -> None:
         self.lr_alpha = lr_alpha
+        self.fused_critic = fused_critic
+        self.encoder = encoder
+        self.encoder_optimizer = encoder_optimizer
+        self.encoder_gradient = encoder_gradient
 
         self.q1 = q1
         self.q2 = q2
@@ -60,9 +99,45 @@ class SACModel(Model):
         self.target_q2 = deepcopy(self.q2)
         self.target_q2.eval()
 
+        if fused_critic:
+            self.q_ensemble = network.QNetworkEnsemble([self.q1, self.q2])
+            self.target_q_ensemble = network.QNetworkEnsemble(
+                [self.target_q1, self.target_q2]
+            )
+
+        self.encoder_policy: network.GaussianPolicy = None
+        if encoder is not None:
+            self._check_encoder()
+            # policy from observations for acting, shares the parameters
+            self.encoder_policy = network.GaussianPolicy(
+                policy.body,
+                encoder.n_inputs,
+                policy.n_actions,
+                encoder,
+                policy.log_std_min,
+                policy.log_std_max,
+            )
+
         self.log_alpha = torch.zeros(1, requires_grad=True)
         self.alpha_optimizer = optim.Adam([self.log_alpha], lr=lr_alpha)
 
+    def _check_encoder(self):
+        if self.encoder_gradient not in ["critic", "policy", "none"]:
+            raise ValueError(
+                f"{self.encoder_gradient=} must be 'critic', 'policy' or 'none'"
+            )
+        if self.encoder_gradient != "none" and self.encoder_optimizer is None:
+            raise ValueError(f"{self.encoder_gradient=} requires an encoder_optimizer")
+        for net in [self.q1, self.q2, self.policy]:
+            if not isinstance(net.head, network.component.ComponentDummy):
+                raise ValueError(
+                    f"{net.head=} must be a ComponentDummy, the encoder is the shared head"
+                )
+            if net.n_observations != self.encoder.n_outputs:
+                raise ValueError(
+                    f"{net.n_observations=} must match {self.encoder.n_outputs=}"
+                )
+
     # epsilon makes sure that log(0) does not occur
 
     def to(self, device: torch.device):
@@ -70,10 +145,15 @@ class SACModel(Model):
         self.target_q1.to(device)
         self.target_q2.to(device)
 
-        for net, optimizer in zip(
-            [self.q1, self.q2, self.policy],
-            [self.q1_optimizer, self.q2_optimizer, self.policy_optimizer],
-        ):
+        nets = [self.q1, self.q2, self.policy]
+        optimizers = [self.q1_optimizer, self.q2_optimizer, self.policy_optimizer]
+        if self.encoder is not None:
+            nets.append(self.encoder)
+            optimizers.append(self.encoder_optimizer)
+        for net, optimizer in zip(nets, optimizers):
+            if optimizer is None:
+                net.to(device)
+                continue
             old_params = net.parameters()
             net.to(device)
             new_params = net.parameters()
@@ -89,19 +169,19 @@ class SACModel(Model):
         self.alpha_optimizer.param_groups[0]["params"] = [self.log_alpha]
 
     def update_target_q(self, tau):
-        for target_param, param in zip(
-            self.target_q1.parameters(), self.q1.parameters()
-        ):
-            target_param.data.copy_(tau * param + (1 - tau) * target_param)
-
-        for target_param, param in zip(
-            self.target_q2.parameters(), self.q2.parameters()
-        ):
-            target_param.data.copy_(tau * param + (1 - tau) * target_param)
-
-    def reset(self) -> None:
+        target_params = [
+            *self.target_q1.parameters(),
+            *self.target_q2.parameters(),
+        ]
+        params = [*self.q1.parameters(), *self.q2.parameters()]
+        with torch.no_grad():
+            torch._foreach_lerp_(target_params, params, tau)
+
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
         for net in self:
-            net.reset()
+            net.reset(batch_indices)
+        if self.encoder is not None:
+            self.encoder.reset(batch_indices)
 
     def __iter__(self) -> Iterator[network.Network]:
         return iter([self.q1, self.q2, self.target_q1, self.target_q2, self.policy])
@@ -114,6 +194,9 @@ class SACModel(Model):
         del self.policy
         del self.policy_optimizer
         del self.alpha_optimizer
+        del self.encoder
+        del self.encoder_optimizer
+        del self.encoder_policy
 
     def state_dicts_network(self, destination: Dict[str, Any] = None) -> Dict[str, Any]:
         ret = state_dicts = {
@@ -124,9 +207,13 @@ class SACModel(Model):
             "policy": self.policy.state_dict(),
             "log_alpha": self.log_alpha.detach(),
         }
+        nets = ["q1", "q2", "target_q1", "target_q2", "policy"]
+        if self.encoder is not None:
+            state_dicts["encoder"] = self.encoder.state_dict()
+            nets.append("encoder")
 
         if destination is not None:
-            for net in ["q1", "q2", "target_q1", "target_q2", "policy"]:
+            for net in nets:
                 state_dict = state_dicts[net]
                 dest = destination[net]
 
@@ -146,13 +233,18 @@ class SACModel(Model):
         self.target_q2.load_state_dict(state_dicts["target_q2"])
 
         self.policy.load_state_dict(state_dicts["policy"])
+        if self.encoder is not None:
+            self.encoder.load_state_dict(state_dicts["encoder"])
 
         self.log_alpha.data.copy_(state_dicts["log_alpha"])
 
-    def to_play_only(self) -> SACModelPlayOnly:
-        policy = deepcopy(self.policy)
+    def to_play_only(self, quantize: bool = False) -> SACModelPlayOnly:
+        if self.encoder is not None:
+            policy = deepcopy(self.encoder_policy)
+        else:
+            policy = deepcopy(self.policy)
         policy.eval()
-        return SACModelPlayOnly(policy)
+        return SACModelPlayOnly(policy, quantize)
 
     def state_dicts_optimizer(self) -> Dict[str, Any]:
         ret = {
@@ -161,14 +253,114 @@ class SACModel(Model):
             "policy_optim": self.policy_optimizer.state_dict(),
             "alpha_optim": self.alpha_optimizer.state_dict(),
         }
+        if self.encoder_optimizer is not None:
+            ret["encoder_optim"] = self.encoder_optimizer.state_dict()
 
         return ret
 
     def load_state_dicts_optimizer(self, state_dicts: Dict[str, Any]) -> None:
-        self.q1_optimizer.load_state_dict(state_dicts["q1_optim"])
-        self.q2_optimizer.load_state_dict(state_dicts["q2_optim"])
-        self.policy_optimizer.load_state_dict(state_dicts["policy_optim"])
-        self.alpha_optimizer.load_state_dict(state_dicts["alpha_optim"])
+        optimizers = {
+            "q1_optim": self.q1_optimizer,
+            "q2_optim": self.q2_optimizer,
+            "policy_optim": self.policy_optimizer,
+            "alpha_optim": self.alpha_optimizer,
+        }
+        if self.encoder_optimizer is not None:
+            optimizers["encoder_optim"] = self.encoder_optimizer
+        for name, optimizer in optimizers.items():
+            state_dict = state_dicts[name]
+            if self._is_pre_fusion_state(optimizer, state_dict):
+                log_info = f"{name}: merging per head output layer states"
+                logging.getLogger(self.__module__).info(log_info)
+                state_dict = self._merge_output_layer_states(optimizer, state_dict)
+            optimizer.load_state_dict(state_dict)
+
+    def _fused_output_layers(self) -> Dict[int, network.component.Component]:
+        # id of fused output layer weight -> component with more than one head
+        nets = [self.q1, self.q2, self.policy]
+        if self.encoder is not None:
+            nets.append(self.encoder)
+        fused_layers = {}
+        for net in nets:
+            for module in net.modules():
+                output_sizes = getattr(module, "_output_sizes", None)
+                if output_sizes is not None and len(output_sizes) > 1:
+                    fused_layers[id(module._output_layer.weight)] = module
+        return fused_layers
+
+    def _pre_fusion_group_sizes(self, optimizer: torch.optim.Optimizer) -> List[int]:
+        # before the fused output layer every head had its own weight and bias
+        fused_layers = self._fused_output_layers()
+        sizes = []
+        for param_group in optimizer.param_groups:
+            size = len(param_group["params"])
+            for param in param_group["params"]:
+                if id(param) in fused_layers:
+                    size += 2 * len(fused_layers[id(param)]._output_sizes) - 2
+            sizes.append(size)
+        return sizes
+
+    def _is_pre_fusion_state(
+        self, optimizer: torch.optim.Optimizer, state_dict: Dict[str, Any]
+    ) -> bool:
+        saved_sizes = [len(group["params"]) for group in state_dict["param_groups"]]
+        sizes = [len(group["params"]) for group in optimizer.param_groups]
+        if saved_sizes == sizes:
+            return False
+        return saved_sizes == self._pre_fusion_group_sizes(optimizer)
+
+    def _merge_output_layer_states(
+        self, optimizer: torch.optim.Optimizer, state_dict: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        fused_layers = self._fused_output_layers()
+        state = {}
+        param_groups = []
+        new_idx = 0
+        for param_group, saved_group in zip(
+            optimizer.param_groups, state_dict["param_groups"]
+        ):
+            params = param_group["params"]
+            old_indices = saved_group["params"]
+            merged = []
+            i = j = 0
+            while i < len(params):
+                component = fused_layers.get(id(params[i]))
+                if component is None:
+                    merged.append([old_indices[j]])
+                    i += 1
+                    j += 1
+                    continue
+                bias = component._output_layer.bias
+                if i + 1 == len(params) or params[i + 1] is not bias:
+                    raise ValueError(
+                        f"{component=} output layer weight and bias must follow each other"
+                    )
+                # old order: head 0 weight, head 0 bias, head 1 weight, ...
+                n_heads = len(component._output_sizes)
+                head_indices = old_indices[j : j + 2 * n_heads]
+                merged += [head_indices[0::2], head_indices[1::2]]
+                i += 2
+                j += 2 * n_heads
+            for indices in merged:
+                head_states = [state_dict["state"].get(idx) for idx in indices]
+                if all(head_state is not None for head_state in head_states):
+                    state[new_idx] = self._merge_head_states(head_states)
+                new_idx += 1
+            param_groups.append(
+                dict(saved_group, params=list(range(new_idx - len(merged), new_idx)))
+            )
+        return {"state": state, "param_groups": param_groups}
+
+    @staticmethod
+    def _merge_head_states(head_states: List[Dict[str, Any]]) -> Dict[str, Any]:
+        merged = {}
+        for key, value in head_states[0].items():
+            if torch.is_tensor(value) and value.dim() > 0:
+                merged[key] = torch.cat([head_state[key] for head_state in head_states])
+            else:
+                # e.g. step, the same for every head
+                merged[key] = value
+        return merged
 
     def state_dicts_scheduler(self) -> Dict[str, Any]:
         if (
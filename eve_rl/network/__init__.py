@@ -3,3 +3,4 @@ from . import component
 from .network import Network
 from .gaussianpolicy import GaussianPolicy
 from .qnetwork import QNetwork
+from .qnetworkensemble import QNetworkEnsemble
@@ -1,15 +1,33 @@
 from abc import abstractmethod
-from typing import List, Union
+from typing import Dict, List, Optional, Tuple, Union
 from torch import nn
 import torch
 from ...util import EveRLObject
 
 
+def merge_output_layers(state_dict: Dict[str, torch.Tensor], prefix: str, *args):
+    # load_state_dict pre hook, state dicts from before the fused output layer
+    # have one linear layer per output head
+    old_prefix = prefix + "_output_layers."
+    for param_name in ["weight", "bias"]:
+        keys = [
+            key
+            for key in state_dict
+            if key.startswith(old_prefix) and key.endswith("." + param_name)
+        ]
+        if not keys:
+            continue
+        keys.sort(key=lambda key: int(key[len(old_prefix) :].split(".")[0]))
+        params = [state_dict.pop(key) for key in keys]
+        state_dict[prefix + "_output_layer." + param_name] = torch.cat(params)
+
+
 class Component(nn.Module, EveRLObject):
     n_inputs: int
     n_outputs: int
     output_layer_size: int
     device: torch.device
+    init_w: float
 
     @abstractmethod
     def forward(
@@ -25,5 +43,25 @@ class Component(nn.Module, EveRLObject):
         return output
 
     @abstractmethod
-    def reset(self) -> None:
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
         ...
+
+    def _create_output_layer(
+        self, n_inputs: int, output_layer_size: Union[int, List[int]]
+    ) -> None:
+        if isinstance(output_layer_size, int):
+            output_layer_size = [output_layer_size]
+        # all output heads in one linear layer, the output is split into views
+        self._output_sizes = list(output_layer_size)
+        layer = nn.Linear(n_inputs, sum(self._output_sizes))
+        layer.weight.data.uniform_(-self.init_w, self.init_w)
+        layer.bias.data.uniform_(-self.init_w, self.init_w)
+        self._output_layer = layer
+
+    def _output_heads(
+        self, state: torch.Tensor
+    ) -> Union[torch.Tensor, Tuple[torch.Tensor, ...]]:
+        output = self._output_layer(state)
+        if len(self._output_sizes) == 1:
+            return output
+        return output.split(self._output_sizes, dim=-1)
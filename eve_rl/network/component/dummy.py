@@ -1,4 +1,4 @@
-from typing import Any, Mapping, Optional
+from typing import Any, List, Mapping, Optional
 import torch
 from .component import Component
 
@@ -20,11 +20,10 @@ class Dummy(Component):
     def device(self) -> torch.device:  # pylint: disable=no-member
         return None
 
-    # pylint: disable=arguments-differ
-    def forward(self, obs_batch: torch.Tensor) -> torch.Tensor:
+    def forward(self, obs_batch: torch.Tensor, *args, **kwds) -> torch.Tensor:
         return obs_batch
 
-    def reset(self) -> None:
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
         ...
 
     def load_state_dict(self, state_dict: Mapping[str, Any], strict: bool = True):
@@ -1,10 +1,12 @@
 from typing import List, Optional, Union
 import torch
 from torch import nn
-from ..network import Network
+from torch.nn.utils.rnn import PackedSequence, pack_padded_sequence, pad_packed_sequence
+from torch.utils.checkpoint import checkpoint
+from .component import Component, merge_output_layers
 
 
-class LSTM(Network):
+class LSTM(Component):
     def __init__(
         self,
         n_layer: int,
@@ -12,19 +14,23 @@ class LSTM(Network):
         n_inputs: Optional[int] = None,
         output_layer_size: Optional[Union[int, List[int]]] = None,
         init_w: float = 3e-3,
+        checkpoint_chunk_size: Optional[int] = None,
     ):
         super().__init__()
         self.n_layer = n_layer
         self.n_nodes = n_nodes
         self.init_w = init_w
+        self.checkpoint_chunk_size = checkpoint_chunk_size
 
         self._lstm: nn.LSTM = None
-        self._output_layers: List[nn.Linear] = None
+        self._output_layer: nn.Linear = None
+        self._output_sizes: List[int] = None
 
         if n_inputs is not None:
             self.n_inputs = n_inputs
         if output_layer_size is not None:
             self.output_layer_size = output_layer_size
+        self._register_load_state_dict_pre_hook(merge_output_layers)
 
         self._hidden_state = None
 
@@ -49,29 +55,22 @@ class LSTM(Network):
 
     @property
     def n_outputs(self) -> int:
-        if self._output_layers is None:
+        if self._output_layer is None:
             return self._lstm.hidden_size
-        out = [layer.out_features for layer in self._output_layers]
+        out = list(self._output_sizes)
         out = out[0] if len(out) == 1 else out
         return out
 
     @property
     def output_layer_size(self) -> int:
-        if self._output_layers is None:
+        if self._output_layer is None:
             return None
         return self.n_outputs
 
     @output_layer_size.setter
     def output_layer_size(self, output_layer_size: int) -> None:
-        if self._output_layers is None:
-            if isinstance(output_layer_size, int):
-                output_layer_size = [output_layer_size]
-            self._output_layers = nn.ModuleList()
-            for n_outputs in output_layer_size:
-                layer = nn.Linear(self._lstm.hidden_size, n_outputs)
-                layer.weight.data.uniform_(-self.init_w, self.init_w)
-                layer.bias.data.uniform_(-self.init_w, self.init_w)
-                self._output_layers.append(layer)
+        if self._output_layer is None:
+            self._create_output_layer(self._lstm.hidden_size, output_layer_size)
 
         elif self.output_layer_size != output_layer_size:
             raise ValueError(
@@ -80,24 +79,97 @@ class LSTM(Network):
 
     @property
     def device(self) -> torch.device:  # pylint: disable=no-member
-        return self.lstm.all_weights[0][0].device
+        return self._lstm.all_weights[0][0].device
 
-    def forward(self, obs_batch: torch.Tensor, *args, **kwds) -> torch.Tensor:
-        output, _ = self._lstm.forward(obs_batch)
-        if self._output_layers is not None:
-            state = [layer(state) for layer in self._output_layers]
-            state = state[0] if len(state) == 1 else state
+    def forward(
+        self,
+        obs_batch: torch.Tensor,
+        *args,
+        lengths: Optional[torch.Tensor] = None,
+        **kwds,
+    ) -> Union[torch.Tensor, List[torch.Tensor]]:
+        chunk_size = self.checkpoint_chunk_size
+        if (
+            chunk_size is not None
+            and torch.is_grad_enabled()
+            and obs_batch.shape[1] > chunk_size
+        ):
+            # checkpointed chunks run padded, lengths are not used
+            output = self._checkpointed_lstm(obs_batch, chunk_size)
+        elif lengths is not None:
+            return self._packed_forward(obs_batch, lengths)
+        else:
+            output, _ = self._lstm.forward(obs_batch)
+        return self._output(output)
+
+    # lengths [batch] on the cpu, padded steps are neither computed nor passed
+    # through the output layers, their output is zero
+    def _packed_forward(
+        self, obs_batch: torch.Tensor, lengths: torch.Tensor
+    ) -> Union[torch.Tensor, List[torch.Tensor]]:
+        packed = pack_padded_sequence(
+            obs_batch, lengths, batch_first=True, enforce_sorted=False
+        )
+        output, _ = self._lstm.forward(packed)
+        if self._output_layer is not None:
+            output = output._replace(data=self._output_layer(output.data))
+        output = self._unpack(output, obs_batch.shape[1])
+        if self._output_layer is None or len(self._output_sizes) == 1:
+            return output
+        return output.split(self._output_sizes, dim=-1)
+
+    @staticmethod
+    def _unpack(packed: PackedSequence, total_length: int) -> torch.Tensor:
+        output, _ = pad_packed_sequence(
+            packed, batch_first=True, total_length=total_length
+        )
         return output
 
-    def forward_play(self, obs_batch: torch.Tensor, *args, **kwds) -> torch.Tensor:
+    # only the hidden states between the chunks are kept, the activations inside
+    # a chunk are recomputed in backward
+    def _checkpointed_lstm(
+        self, obs_batch: torch.Tensor, chunk_size: int
+    ) -> torch.Tensor:
+        outputs = []
+        hidden_state = None
+        for chunk in obs_batch.split(chunk_size, dim=1):
+            output, hidden_state = checkpoint(
+                self._lstm, chunk, hidden_state, use_reentrant=False
+            )
+            outputs.append(output)
+        return torch.cat(outputs, dim=1)
+
+    def forward_play(
+        self, obs_batch: torch.Tensor, *args, **kwds
+    ) -> Union[torch.Tensor, List[torch.Tensor]]:
         with torch.no_grad():
+            if (
+                self._hidden_state is not None
+                and self._hidden_state[0].shape[1] != obs_batch.shape[0]
+            ):
+                self._hidden_state = None
             output, self._hidden_state = self._lstm.forward(
                 obs_batch, self._hidden_state
             )
-            if self._output_layers is not None:
-                state = [layer(state) for layer in self._output_layers]
-                state = state[0] if len(state) == 1 else state
+            output = self._output(output)
         return output
 
-    def reset(self):
-        self._hidden_state = None
+    def _output(self, output: torch.Tensor) -> Union[torch.Tensor, List[torch.Tensor]]:
+        if self._output_layer is not None:
+            output = self._output_heads(output)
+        return output
+
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
+        if batch_indices is None or self._hidden_state is None:
+            self._hidden_state = None
+            return
+        # only the given rows start a new sequence, out of place to keep the other rows
+        hidden_state = self._hidden_state[0]
+        keep = torch.ones(
+            hidden_state.shape[1],
+            1,
+            dtype=hidden_state.dtype,
+            device=hidden_state.device,
+        )
+        keep[torch.as_tensor(batch_indices, dtype=torch.long)] = 0
+        self._hidden_state = tuple(state * keep for state in self._hidden_state)
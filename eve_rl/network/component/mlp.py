@@ -4,7 +4,7 @@ import torch
 from torch import nn
 import torch.nn.functional as F
 
-from .component import Component
+from .component import Component, merge_output_layers
 
 
 class MLP(Component):
@@ -20,7 +20,8 @@ class MLP(Component):
         self.init_w = init_w
 
         self._input_layer: nn.Linear = None
-        self._output_layers: List[nn.Linear] = None
+        self._output_layer: nn.Linear = None
+        self._output_sizes: List[int] = None
         self._layers: List[nn.Linear] = nn.ModuleList()
         layers_in = self.hidden_layers[:-1]
         layers_out = self.hidden_layers[1:]
@@ -30,6 +31,7 @@ class MLP(Component):
             self.n_inputs = n_inputs
         if output_layer_size is not None:
             self.output_layer_size = output_layer_size
+        self._register_load_state_dict_pre_hook(merge_output_layers)
 
     @property
     def n_inputs(self) -> int:
@@ -47,29 +49,22 @@ class MLP(Component):
 
     @property
     def n_outputs(self) -> Union[int, List[int]]:
-        if self._output_layers is None:
+        if self._output_layer is None:
             return self._layers[-1].out_features
-        out = [layer.out_features for layer in self._output_layers]
+        out = list(self._output_sizes)
         out = out[0] if len(out) == 1 else out
         return out
 
     @property
     def output_layer_size(self) -> Union[int, List[int]]:
-        if self._output_layers is None:
+        if self._output_layer is None:
             return None
         return self.n_outputs
 
     @output_layer_size.setter
     def output_layer_size(self, output_layer_size: Union[int, List[int]]) -> None:
-        if self._output_layers is None:
-            if isinstance(output_layer_size, int):
-                output_layer_size = [output_layer_size]
-            self._output_layers = nn.ModuleList()
-            for n_outputs in output_layer_size:
-                layer = nn.Linear(self._layers[-1].out_features, n_outputs)
-                layer.weight.data.uniform_(-self.init_w, self.init_w)
-                layer.bias.data.uniform_(-self.init_w, self.init_w)
-                self._output_layers.append(layer)
+        if self._output_layer is None:
+            self._create_output_layer(self._layers[-1].out_features, output_layer_size)
         elif self.output_layer_size != output_layer_size:
             raise ValueError(
                 f"{self.output_layer_size=} already set different than {output_layer_size=}"
@@ -85,11 +80,10 @@ class MLP(Component):
         for layer in self._layers:
             state = layer(state)
             state = F.relu(state)
-        if self._output_layers is not None:
+        if self._output_layer is not None:
             # output without relu
-            state = [layer(state) for layer in self._output_layers]
-            state = state[0] if len(state) == 1 else state
+            state = self._output_heads(state)
         return state
 
-    def reset(self) -> None:
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
         ...
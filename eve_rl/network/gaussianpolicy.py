@@ -1,4 +1,4 @@
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 import logging
 import torch
 
@@ -35,11 +35,15 @@ class GaussianPolicy(Network):
         return self.body.device
 
     def forward(
-        self, obs_batch: torch.Tensor, *args, **kwds
+        self,
+        obs_batch: torch.Tensor,
+        *args,
+        lengths: Optional[torch.Tensor] = None,
+        **kwds,
     ) -> Tuple[torch.Tensor, torch.Tensor]:
-        head_out = self.head(obs_batch)
+        head_out = self.head(obs_batch, lengths=lengths)
 
-        mean, log_std = self.body.forward(head_out)
+        mean, log_std = self.body.forward(head_out, lengths=lengths)
         log_std = torch.clamp(log_std, self.log_std_min, self.log_std_max)
 
         return mean, log_std
@@ -52,5 +56,6 @@ class GaussianPolicy(Network):
         log_std = torch.clamp(log_std, self.log_std_min, self.log_std_max)
         return mean, log_std
 
-    def reset(self) -> None:
-        ...
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
+        self.head.reset(batch_indices)
+        self.body.reset(batch_indices)
@@ -1,4 +1,5 @@
 from abc import abstractmethod
+from typing import List, Optional
 from torch import nn
 import torch
 
@@ -24,5 +25,5 @@ class Network(nn.Module, EveRLObject):
         return output
 
     @abstractmethod
-    def reset(self) -> None:
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
         ...
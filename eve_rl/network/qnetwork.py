@@ -1,7 +1,7 @@
 # pylint: disable=no-member
 # pylint: disable=arguments-differ
 
-from typing import Optional
+from typing import List, Optional
 import torch
 
 from .component import Component, ComponentDummy
@@ -31,11 +31,16 @@ class QNetwork(Network):
         return self.body.device
 
     def forward(
-        self, obs_batch: torch.Tensor, action_batch: torch.Tensor, *args, **kwds
+        self,
+        obs_batch: torch.Tensor,
+        action_batch: torch.Tensor,
+        *args,
+        lengths: Optional[torch.Tensor] = None,
+        **kwds,
     ) -> torch.Tensor:
-        head_out = self.head(obs_batch)
+        head_out = self.head(obs_batch, lengths=lengths)
         body_in = torch.dstack([head_out, action_batch])
-        q_value_batch = self.body(body_in)
+        q_value_batch = self.body(body_in, lengths=lengths)
         return q_value_batch
 
     def forward_play(
@@ -46,5 +51,6 @@ class QNetwork(Network):
         q_value_batch = self.body.forward_play(body_in)
         return q_value_batch
 
-    def reset(self) -> None:
-        ...
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
+        self.head.reset(batch_indices)
+        self.body.reset(batch_indices)
@@ -0,0 +1,118 @@
+# pylint: disable=no-member
+# pylint: disable=arguments-differ
+
+from typing import List, Optional, Tuple
+import torch
+import torch.nn.functional as F
+
+from .component import MLP, ComponentDummy
+from .network import Network
+from .qnetwork import QNetwork
+
+
+class QNetworkEnsemble(Network):
+    def __init__(self, q_networks: List[QNetwork]):
+        super().__init__()
+        # plain list, the q_networks stay the owners of the parameters
+        self.q_networks = q_networks
+        self.n_observations = q_networks[0].n_observations
+        self.n_actions = q_networks[0].n_actions
+        self.fused = self._fusable(q_networks)
+        self._stacked: Tuple[torch.Tensor, ...] = None
+        self._stacked_key: Tuple = None
+
+    @property
+    def device(self) -> torch.device:
+        return self.q_networks[0].device
+
+    @staticmethod
+    def _fusable(q_networks: List[QNetwork]) -> bool:
+        for q_network in q_networks:
+            if not isinstance(q_network.head, ComponentDummy):
+                return False
+            if not isinstance(q_network.body, MLP):
+                return False
+        hidden_layers = q_networks[0].body.hidden_layers
+        return all(
+            q_network.body.hidden_layers == hidden_layers for q_network in q_networks
+        )
+
+    def forward(
+        self, obs_batch: torch.Tensor, action_batch: torch.Tensor, *args, **kwds
+    ) -> torch.Tensor:
+        if not self.fused:
+            q_value_batches = [
+                q_network(obs_batch, action_batch, *args, **kwds)
+                for q_network in self.q_networks
+            ]
+            return torch.stack(q_value_batches)
+
+        n_networks = len(self.q_networks)
+        body_in = torch.dstack([obs_batch, action_batch])
+        weights = self._stacked_parameters()
+
+        # the input is shared, so the input layers are one concatenated matmul
+        state = F.linear(body_in, weights[0], weights[1])
+        state = state.unflatten(-1, (n_networks, -1)).movedim(-2, 0)
+        batch_shape = state.shape[1:-1]
+        state = state.flatten(1, -2)
+
+        for i in range(2, len(weights) - 2, 2):
+            state = self._batched_linear(state, weights[i], weights[i + 1])
+            state = F.relu(state)
+        state = self._batched_linear(state, weights[-2], weights[-1])
+        return state.unflatten(1, batch_shape)
+
+    # only the no_grad forwards (target q values, play) reuse the stacked weights, a
+    # cached graph could be stale after the next forward or backward. They are
+    # stacked again if a parameter changed (optimizer step, target update,
+    # load_state_dict, to)
+    def _stacked_parameters(self) -> Tuple[torch.Tensor, ...]:
+        if torch.is_grad_enabled() or torch.compiler.is_compiling():
+            return self._stack_parameters()
+        params = [
+            param for q_network in self.q_networks for param in q_network.parameters()
+        ]
+        key = tuple((id(param), param.data_ptr(), param._version) for param in params)
+        if key != self._stacked_key:
+            self._stacked = self._stack_parameters()
+            self._stacked_key = key
+        return self._stacked
+
+    def _stack_parameters(self) -> Tuple[torch.Tensor, ...]:
+        bodies: List[MLP] = [q_network.body for q_network in self.q_networks]
+        input_layers = [body._input_layer for body in bodies]
+        stacked = [
+            torch.cat([layer.weight for layer in input_layers]),
+            torch.cat([layer.bias for layer in input_layers]),
+        ]
+        layers = list(zip(*[body._layers for body in bodies]))
+        layers.append([body._output_layer for body in bodies])
+        for ensemble_layers in layers:
+            stacked.append(torch.stack([layer.weight for layer in ensemble_layers]))
+            stacked.append(torch.stack([layer.bias for layer in ensemble_layers]))
+        return tuple(stacked)
+
+    def forward_play(
+        self, obs_batch: torch.Tensor, action_batch: torch.Tensor, *args, **kwds
+    ) -> torch.Tensor:
+        with torch.no_grad():
+            q_value_batch = self.forward(obs_batch, action_batch, *args, **kwds)
+        return q_value_batch
+
+    @staticmethod
+    def _batched_linear(
+        state: torch.Tensor, weight: torch.Tensor, bias: torch.Tensor
+    ) -> torch.Tensor:
+        return torch.baddbmm(bias.unsqueeze(1), state, weight.transpose(1, 2))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the cached weights are copies of the old parameters, stacked again after copies
+        state["_stacked"] = None
+        state["_stacked_key"] = None
+        return state
+
+    def reset(self, batch_indices: Optional[List[int]] = None) -> None:
+        for q_network in self.q_networks:
+            q_network.reset(batch_indices)
@@ -1 +1 @@
-from .optim import Optimizer, Adam
+from .optim import Optimizer, Adam, AdamW, SGD, RMSprop
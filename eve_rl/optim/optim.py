@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 from torch import optim
 from ..network import Network
 from ..network.component import Component
@@ -14,7 +14,7 @@ class Optimizer(EveRLObject, ABC):
             Union[Network, Component], List[Union[Network, Component]], List[Dict]
         ],
         *args,
-        **kwargs
+        **kwargs,
     ) -> None:
         self.networks = networks
 
@@ -55,12 +55,12 @@ class Adam(optim.Adam, Optimizer):
         eps=1e-08,
         weight_decay=0,
         amsgrad=False,
-        # *,
-        # foreach=None,
-        # maximize=False,
-        # capturable=False,
-        # differentiable=False,
-        # fused=None
+        *,
+        foreach: Optional[bool] = None,
+        maximize: bool = False,
+        capturable: bool = False,
+        differentiable: bool = False,
+        fused: Optional[bool] = None,
     ) -> None:
         self.networks = networks
 
@@ -72,11 +72,117 @@ class Adam(optim.Adam, Optimizer):
             eps,
             weight_decay,
             amsgrad,
-            # foreach=foreach,
-            # maximize=maximize,
-            # capturable=capturable,
-            # differentiable=differentiable,
-            # fused=fused,
+            foreach=foreach,
+            maximize=maximize,
+            capturable=capturable,
+            differentiable=differentiable,
+            fused=fused,
+        )
+        for key, value in self.defaults.items():
+            setattr(self, key, value)
+
+
+class AdamW(optim.AdamW, Optimizer):
+    def __init__(
+        self,
+        networks: Union[Network, List[Network], List[Dict]],
+        lr=0.001,
+        betas=(0.9, 0.999),
+        eps=1e-08,
+        weight_decay=0.01,
+        amsgrad=False,
+        *,
+        foreach: Optional[bool] = None,
+        maximize: bool = False,
+        capturable: bool = False,
+        differentiable: bool = False,
+        fused: Optional[bool] = None,
+    ) -> None:
+        self.networks = networks
+
+        optim.AdamW.__init__(
+            self,
+            self._networks_to_params(networks),
+            lr,
+            betas,
+            eps,
+            weight_decay,
+            amsgrad,
+            foreach=foreach,
+            maximize=maximize,
+            capturable=capturable,
+            differentiable=differentiable,
+            fused=fused,
+        )
+        for key, value in self.defaults.items():
+            setattr(self, key, value)
+
+
+class SGD(optim.SGD, Optimizer):
+    def __init__(
+        self,
+        networks: Union[Network, List[Network], List[Dict]],
+        lr=0.001,
+        momentum=0,
+        dampening=0,
+        weight_decay=0,
+        nesterov=False,
+        *,
+        foreach: Optional[bool] = None,
+        maximize: bool = False,
+        differentiable: bool = False,
+        fused: Optional[bool] = None,
+    ) -> None:
+        self.networks = networks
+
+        optim.SGD.__init__(
+            self,
+            self._networks_to_params(networks),
+            lr,
+            momentum,
+            dampening,
+            weight_decay,
+            nesterov,
+            foreach=foreach,
+            maximize=maximize,
+            differentiable=differentiable,
+            fused=fused,
+        )
+        for key, value in self.defaults.items():
+            setattr(self, key, value)
+
+
+class RMSprop(optim.RMSprop, Optimizer):
+    def __init__(
+        self,
+        networks: Union[Network, List[Network], List[Dict]],
+        lr=0.01,
+        alpha=0.99,
+        eps=1e-08,
+        weight_decay=0,
+        momentum=0,
+        centered=False,
+        *,
+        foreach: Optional[bool] = None,
+        maximize: bool = False,
+        capturable: bool = False,
+        differentiable: bool = False,
+    ) -> None:
+        self.networks = networks
+
+        optim.RMSprop.__init__(
+            self,
+            self._networks_to_params(networks),
+            lr,
+            alpha,
+            eps,
+            weight_decay,
+            momentum,
+            centered,
+            capturable=capturable,
+            foreach=foreach,
+            maximize=maximize,
+            differentiable=differentiable,
         )
         for key, value in self.defaults.items():
             setattr(self, key, value)
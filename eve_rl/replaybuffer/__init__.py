@@ -1,5 +1,10 @@
-from .replaybuffer import ReplayBuffer, Batch, Episode
+from .replaybuffer import ReplayBuffer, Batch, Episode, EpisodeSummary
 from .vanillastep import VanillaStep
 from .vanillaepisode import VanillaEpisode
-from .vanillashared import VanillaStepShared, VanillaEpisodeShared
+from .vanillastepframestack import VanillaStepFrameStack
+from .vanillashared import (
+    VanillaStepShared,
+    VanillaEpisodeShared,
+    VanillaStepFrameStackShared,
+)
 from .vanillashared import VanillaSharedBase as ReplayBufferShared
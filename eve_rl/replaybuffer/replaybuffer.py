@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, NamedTuple, Optional, Union
 import numpy as np
 
@@ -48,19 +48,52 @@ class Episode:
         self.infos.append(info)
         self.episode_reward += reward
 
+    @property
+    def final_info(self) -> Dict[str, Any]:
+        return self.infos[-1] if self.infos else {}
+
+    def to_summary(self, info_keys: Optional[List[str]] = None) -> "EpisodeSummary":
+        final_info = self.final_info
+        if info_keys is not None:
+            final_info = {
+                key: final_info[key] for key in info_keys if key in final_info
+            }
+        return EpisodeSummary(
+            len(self), self.episode_reward, self.seed, self.options, final_info
+        )
+
     def to_replay(self):
-        return EpisodeReplay(self.flat_obs, self.actions, self.rewards, self.terminals)
+        return EpisodeReplay(
+            self.flat_obs,
+            self.actions,
+            self.rewards,
+            self.terminals,
+            self.flat_state_to_state,
+        )
 
     def __len__(self):
         return len(self.actions)
 
 
+@dataclass
+class EpisodeSummary:
+    n_steps: int
+    episode_reward: float
+    seed: Optional[int] = None
+    options: Optional[Dict[str, Any]] = None
+    final_info: Dict[str, Any] = field(default_factory=dict)
+
+    def __len__(self):
+        return self.n_steps
+
+
 @dataclass
 class EpisodeReplay:
     flat_obs: List[np.ndarray]
     actions: List[np.ndarray]
     rewards: List[float]
     terminals: List[bool]
+    flat_obs_to_obs: Optional[Union[List, Dict]] = None
 
     def __len__(self):
         return len(self.actions)
@@ -104,6 +137,27 @@ class Batch(NamedTuple):
             padding_mask = None
         return Batch(obs, actions, rewards, terminals, padding_mask)
 
+    @classmethod
+    def stack(cls, batches: List["Batch"]) -> "Batch":
+        # stacks along a new first dimension, sequences are zero padded to the longest
+        def pad_stack(tensors: List[torch.Tensor]) -> torch.Tensor:
+            length = max(tensor.shape[1] for tensor in tensors)
+            shape = (len(tensors), tensors[0].shape[0], length, *tensors[0].shape[2:])
+            stacked = tensors[0].new_zeros(shape)
+            for i, tensor in enumerate(tensors):
+                stacked[i, :, : tensor.shape[1]] = tensor
+            return stacked
+
+        obs = pad_stack([batch.obs for batch in batches])
+        actions = pad_stack([batch.actions for batch in batches])
+        rewards = pad_stack([batch.rewards for batch in batches])
+        terminals = pad_stack([batch.terminals for batch in batches])
+        if batches[0].padding_mask is not None:
+            padding_mask = pad_stack([batch.padding_mask for batch in batches])
+        else:
+            padding_mask = None
+        return cls(obs, actions, rewards, terminals, padding_mask)
+
 
 class ReplayBuffer(EveRLObject, ABC):
     @property
@@ -119,6 +173,10 @@ class ReplayBuffer(EveRLObject, ABC):
     def sample(self) -> Batch:
         ...
 
+    def sample_stack(self, n_batches: int) -> Batch:
+        batches = [self.sample() for _ in range(n_batches)]
+        return Batch.stack(batches)
+
     @abstractmethod
     def copy(self):
         ...
@@ -1,4 +1,5 @@
 from time import sleep
+from typing import List, Union
 from multiprocessing.synchronize import Lock as mp_lock
 from multiprocessing.synchronize import Event as mp_event
 import torch
@@ -7,6 +8,7 @@ import torch.multiprocessing as mp
 from .replaybuffer import ReplayBuffer, Episode, Batch
 from .vanillaepisode import VanillaEpisode
 from .vanillastep import VanillaStep
+from .vanillastepframestack import VanillaStepFrameStack
 
 
 class VanillaSharedBase(ReplayBuffer):
@@ -127,3 +129,23 @@ class VanillaEpisodeShared(VanillaStepShared):
         # os.nice(15)
         internal_replay_buffer = VanillaEpisode(self.capacity, self._batch_size)
         self.loop(internal_replay_buffer)
+
+
+class VanillaStepFrameStackShared(VanillaStepShared):
+    def __init__(
+        self,
+        capacity,
+        batch_size,
+        sample_device: torch.device,
+        stacked_obs: List[Union[str, int]],
+        newest_first: bool = True,
+    ):
+        self.stacked_obs = stacked_obs
+        self.newest_first = newest_first
+        super().__init__(capacity, batch_size, sample_device)
+
+    def run(self):
+        internal_replay_buffer = VanillaStepFrameStack(
+            self.capacity, self._batch_size, self.stacked_obs, self.newest_first
+        )
+        self.loop(internal_replay_buffer)
@@ -0,0 +1,198 @@
+from typing import Dict, List, Optional, Union
+import numpy as np
+import torch
+from .replaybuffer import ReplayBuffer, Episode, EpisodeReplay, Batch
+
+
+# Observation entries in stacked_obs carry their frame history in the first
+# dimension. Only the newest frame of each step is stored, the stacks are rebuilt
+# by index at sample time. History before the episode start repeats the first frame.
+class VanillaStepFrameStack(ReplayBuffer):
+    def __init__(
+        self,
+        capacity: int,
+        batch_size: int,
+        stacked_obs: List[Union[str, int]],
+        newest_first: bool = True,
+    ):
+        self.capacity = capacity
+        self._batch_size = batch_size
+        self.stacked_obs = stacked_obs
+        self.newest_first = newest_first
+        self.position = 0
+
+        self._capacity = int(capacity)
+        self._size = 0
+        self._n_transitions = 0
+        self._n_lags = 1
+        self._frame_idx: np.ndarray = None
+        self._lag: np.ndarray = None
+        self._column: np.ndarray = None
+
+        self._frames: np.ndarray = None
+        self._actions: np.ndarray = None
+        self._rewards: np.ndarray = None
+        self._terminals: np.ndarray = None
+        self._offsets: np.ndarray = None
+        self._valid: np.ndarray = None
+
+    @property
+    def batch_size(self) -> int:
+        return self._batch_size
+
+    def push(self, episode: Union[Episode, EpisodeReplay]) -> None:
+        if len(episode) < 1:
+            return
+        if self._frames is None:
+            self._init_storage(episode)
+
+        flat_obs = np.asarray(episode.flat_obs, dtype=np.float32)
+        n_rows = flat_obs.shape[0]
+        rows = (self.position + np.arange(n_rows)) % self._capacity
+        actions = np.asarray(episode.actions, dtype=np.float32).reshape(n_rows - 1, -1)
+
+        self._n_transitions -= int(np.count_nonzero(self._valid[rows]))
+        self._frames[rows] = flat_obs[:, self._frame_idx]
+        self._actions[rows[:-1]] = actions
+        self._rewards[rows[:-1]] = episode.rewards
+        self._terminals[rows[:-1]] = episode.terminals
+        self._offsets[rows] = np.arange(n_rows)
+        self._valid[rows[:-1]] = True
+        self._valid[rows[-1]] = False
+        self._n_transitions += n_rows - 1
+
+        self.position = int((self.position + n_rows) % self._capacity)
+        self._size = min(self._size + n_rows, self._capacity)
+
+    def sample(self) -> Batch:
+        idx = self._sample_indices()
+        offsets = self._offsets[idx]
+        state = self._stack_frames(idx, offsets)
+        next_state = self._stack_frames((idx + 1) % self._capacity, offsets + 1)
+
+        obs = torch.from_numpy(np.stack([state, next_state], axis=1))
+        actions = torch.from_numpy(self._actions[idx]).unsqueeze(1)
+        rewards = torch.from_numpy(self._rewards[idx]).unsqueeze(1).unsqueeze(1)
+        terminals = torch.from_numpy(self._terminals[idx]).unsqueeze(1).unsqueeze(1)
+        return Batch(obs, actions, rewards, terminals)
+
+    def _sample_indices(self) -> np.ndarray:
+        # rejection sampling without replacement, the share of rows without a
+        # transition (episode ends) is small
+        idx = np.empty(0, dtype=np.int64)
+        for _ in range(10):
+            candidates = np.random.randint(0, self._size, 2 * self.batch_size)
+            candidates = candidates[self._sampleable(candidates)]
+            idx = np.unique(np.concatenate([idx, candidates]))
+            if idx.size >= self.batch_size:
+                return np.random.permutation(idx)[: self.batch_size]
+
+        candidates = np.arange(self._size)
+        candidates = candidates[self._sampleable(candidates)]
+        return np.random.choice(candidates, self.batch_size, replace=False)
+
+    def _sampleable(self, rows: np.ndarray) -> np.ndarray:
+        sampleable = self._valid[rows]
+        if self._size == self._capacity:
+            # the history of the oldest episode may already be overwritten
+            age = (rows - self.position) % self._capacity
+            lookback = np.minimum(self._offsets[rows], self._n_lags - 1)
+            sampleable &= lookback <= age
+        return sampleable
+
+    def _stack_frames(self, rows: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        lag = np.minimum(self._lag[None, :], offsets[:, None])
+        src_rows = (rows[:, None] - lag) % self._capacity
+        return self._frames[src_rows, self._column[None, :]]
+
+    def _init_storage(self, episode: Union[Episode, EpisodeReplay]) -> None:
+        if isinstance(episode, Episode):
+            flat_obs_to_obs = episode.flat_state_to_state
+        else:
+            flat_obs_to_obs = episode.flat_obs_to_obs
+        self._build_layout(flat_obs_to_obs)
+
+        n_actions = np.asarray(episode.actions[0]).size
+        capacity = self._capacity
+        self._frames = np.empty((capacity, self._frame_idx.size), dtype=np.float32)
+        self._actions = np.zeros((capacity, n_actions), dtype=np.float32)
+        self._rewards = np.zeros(capacity, dtype=np.float32)
+        self._terminals = np.zeros(capacity, dtype=bool)
+        self._offsets = np.zeros(capacity, dtype=np.int64)
+        self._valid = np.zeros(capacity, dtype=bool)
+
+    def _build_layout(self, flat_obs_to_obs: Optional[Union[List, Dict]]) -> None:
+        if isinstance(flat_obs_to_obs, dict):
+            entries = list(flat_obs_to_obs.items())
+        elif isinstance(flat_obs_to_obs, list):
+            entries = list(enumerate(flat_obs_to_obs))
+        else:
+            raise ValueError(
+                f"{flat_obs_to_obs=} must be a list or dict layout to stack frames"
+            )
+        names = [name for name, _ in entries]
+        for name in self.stacked_obs:
+            if name not in names:
+                raise ValueError(f"{name=} of {self.stacked_obs=} not in {names=}")
+
+        entries = sorted(entries, key=lambda entry: entry[1][1][0])
+        frame_idx, lag, column = [], [], []
+        for name, (shape, (start, end)) in entries:
+            column_start = len(frame_idx)
+            if name not in self.stacked_obs:
+                frame_idx += list(range(start, end))
+                lag += [0] * (end - start)
+                column += list(range(column_start, column_start + end - start))
+                continue
+
+            n_frames = shape[0]
+            frame_size = (end - start) // n_frames
+            newest = 0 if self.newest_first else n_frames - 1
+            frame_start = start + newest * frame_size
+            frame_idx += list(range(frame_start, frame_start + frame_size))
+            for frame in range(n_frames):
+                frame_lag = frame if self.newest_first else n_frames - 1 - frame
+                lag += [frame_lag] * frame_size
+                column += list(range(column_start, column_start + frame_size))
+            self._n_lags = max(self._n_lags, n_frames)
+
+        self._frame_idx = np.array(frame_idx, dtype=np.int64)
+        self._lag = np.array(lag, dtype=np.int64)
+        self._column = np.array(column, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self._n_transitions
+
+    def copy(self):
+        copy = self.__class__(
+            self.capacity, self.batch_size, self.stacked_obs, self.newest_first
+        )
+        for attribute in [
+            "position",
+            "_size",
+            "_n_transitions",
+            "_n_lags",
+            "_frame_idx",
+            "_lag",
+            "_column",
+        ]:
+            setattr(copy, attribute, getattr(self, attribute))
+        for attribute in [
+            "_frames",
+            "_actions",
+            "_rewards",
+            "_terminals",
+            "_offsets",
+            "_valid",
+        ]:
+            array = getattr(self, attribute)
+            setattr(copy, attribute, array.copy() if array is not None else None)
+        return copy
+
+    def close(self) -> None:
+        del self._frames
+        del self._actions
+        del self._rewards
+        del self._terminals
+        del self._offsets
+        del self._valid
@@ -1,10 +1,11 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 from math import inf
 import csv
 import logging
 import os
 from ..util import EveRLObject
-from ..agent.agent import Agent, StepCounter, EpisodeCounter
+from ..agent.agent import Agent, Episode, StepCounter, EpisodeCounter
+from ..replaybuffer import EpisodeSummary
 
 
 class Runner(EveRLObject):
@@ -28,6 +29,7 @@ class Runner(EveRLObject):
         self.quality_info = quality_info
         self.info_results = info_results or []
         self.logger = logging.getLogger(self.__module__)
+        self._check_summary_info_keys()
 
         self._results = {
             "episodes explore": 0,
@@ -57,6 +59,22 @@ class Runner(EveRLObject):
 
         self.best_eval = {"steps": 0, "quality": -inf}
 
+    def _check_summary_info_keys(self) -> None:
+        # summaries only keep the final_info keys listed in summary_info_keys
+        if getattr(self.agent, "episode_results", "full") != "summary":
+            return
+        summary_info_keys = self.agent.summary_info_keys
+        if summary_info_keys is None:
+            return
+        keys = self.info_results
+        if self.quality_info is not None:
+            keys = [self.quality_info] + keys
+        missing = [key for key in keys if key not in summary_info_keys]
+        if missing:
+            raise ValueError(
+                f"{missing=} are used by the runner and must be in {summary_info_keys=}"
+            )
+
     @property
     def step_counter(self) -> StepCounter:
         return self.agent.step_counter
@@ -85,36 +103,36 @@ class Runner(EveRLObject):
         checkpoint_file = os.path.join(
             self.checkpoint_folder, f"checkpoint{explore_steps}.everl"
         )
-        result_episodes = self.agent.evaluate(episodes=episodes, seeds=seeds)
-        qualities, rewards = [], []
-        results_for_info = {
-            info_result_name: [] for info_result_name in self.info_results
-        }
+        # episodes are aggregated as they finish and not kept
+        sums = {"quality": 0.0, "reward": 0.0}
+        info_sums = {info_result_name: 0.0 for info_result_name in self.info_results}
         eval_results = {"episodes": []}
-        for episode in result_episodes:
+
+        def aggregate(episode: Union[Episode, EpisodeSummary]) -> None:
             reward = episode.episode_reward
             quality = (
-                episode.infos[-1][self.quality_info]
+                episode.final_info[self.quality_info]
                 if self.quality_info is not None
                 else reward
             )
-            qualities.append(quality)
-            rewards.append(reward)
+            sums["quality"] += quality
+            sums["reward"] += reward
             for info_result_name in self.info_results:
-                info = episode.infos[-1][info_result_name]
-                results_for_info[info_result_name].append(info)
+                info_sums[info_result_name] += episode.final_info[info_result_name]
             eval_results["episodes"].append(
                 {
                     "seed": episode.seed,
                     "options": episode.options,
-                    "quality": episode.infos[-1][self.quality_info],
+                    "quality": episode.final_info[self.quality_info],
                 }
             )
 
-        reward = sum(rewards) / len(rewards)
-        quality = sum(qualities) / len(qualities)
-        for info_result_name, results in results_for_info.items():
-            result = sum(results) / len(results)
+        self.agent.evaluate(episodes=episodes, seeds=seeds, episode_callback=aggregate)
+        n_episodes = len(eval_results["episodes"])
+        reward = sums["reward"] / n_episodes
+        quality = sums["quality"] / n_episodes
+        for info_result_name, info_sum in info_sums.items():
+            result = info_sum / n_episodes
             self._results[info_result_name] = round(result, 3)
         save_best = False
         if quality > self.best_eval["quality"]:
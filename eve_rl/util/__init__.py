@@ -2,4 +2,5 @@ from .confighandler import ConfigHandler
 from .everlobject import EveRLObject
 from .dummyenv import DummyEnv
 from .envfromcp import get_env_from_checkpoint
-from .flattenobs import flatten_obs
+from .flattenobs import flatten_obs, ObsFlattener
+from .phasetimer import PhaseTimer
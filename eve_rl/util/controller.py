@@ -4,6 +4,7 @@ import torch
 
 import eve
 from ..agent import SingleEvalOnly
+from ..algo import SAC, SACPlayOnly, SACInference
 from .flattenobs import flatten_obs
 
 
@@ -66,6 +67,10 @@ class Controller:
         self.agent = SingleEvalOnly.from_checkpoint(
             checkpoint, device=device, env_eval=self.env
         )
+        if isinstance(self.agent.algo, (SAC, SACPlayOnly)):
+            self.policy = SACInference(self.agent.algo)
+        else:
+            self.policy = self.agent.algo
         self.intervention = intervention
         self.fluoroscopy = fluoroscopy
         self.target = target
@@ -133,7 +138,7 @@ class Controller:
 
     def _get_action(self, obs):
         obs_flat, _ = flatten_obs(obs)
-        action = self.agent.algo.get_eval_action(obs_flat)
+        action = self.policy.get_eval_action(obs_flat)
         action = action.reshape(self.last_action.shape)
         if self.agent.normalize_actions:
             action *= self.intervention.action_space.high
@@ -0,0 +1,154 @@
+from time import perf_counter
+from typing import Dict, List, Tuple, Union
+import logging
+import numpy as np
+import torch
+from torch.nn.utils.rnn import pad_sequence
+
+from ..algo import AlgoPlayOnly, SACPlayOnly
+from ..model import SACModelPlayOnly
+from ..network import GaussianPolicy
+from ..optim import Adam
+from ..replaybuffer import Episode, ReplayBuffer
+
+
+class _EpisodeStates:
+    def __init__(self, episodes: List[Episode], batch_size: int) -> None:
+        flat_obs = [
+            torch.as_tensor(np.array(episode.flat_obs), dtype=torch.float32)
+            for episode in episodes
+        ]
+        masks = [torch.ones(len(obs), 1) for obs in flat_obs]
+        self.obs = pad_sequence(flat_obs, batch_first=True)
+        self.mask = pad_sequence(masks, batch_first=True)
+        self.batch_size = batch_size
+
+    def sample(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        idx = torch.randint(self.obs.shape[0], (self.batch_size,))
+        return self.obs[idx], self.mask[idx]
+
+
+class _ReplayStates:
+    def __init__(self, replay_buffer: ReplayBuffer) -> None:
+        self.replay_buffer = replay_buffer
+
+    def sample(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        batch = self.replay_buffer.sample()
+        obs = batch.obs.to(dtype=torch.float32)
+        if batch.padding_mask is None:
+            return obs, torch.ones(*obs.shape[:2], 1)
+        # the padding mask covers the transitions, the first observation is always valid
+        first = torch.ones_like(batch.padding_mask[:, :1])
+        mask = torch.cat([first, batch.padding_mask.to(dtype=torch.float32)], dim=1)
+        return obs, mask
+
+
+def _latency(policy: GaussianPolicy, n_observations: int, n_repeats: int) -> float:
+    obs = torch.zeros((1, 1, n_observations), device=policy.device)
+    policy.reset()
+    with torch.no_grad():
+        policy.forward_play(obs)
+        t_start = perf_counter()
+        for _ in range(n_repeats):
+            policy.forward_play(obs)
+        duration = perf_counter() - t_start
+    policy.reset()
+    return duration / n_repeats
+
+
+# Trains student to match the policy of the checkpoint on states from a replay buffer
+# or recorded episodes and saves it as play-only checkpoint. Returns the action error
+# of the student on freshly sampled states and the single observation latencies.
+def distill_policy(
+    checkpoint_path: str,
+    student: GaussianPolicy,
+    data: Union[ReplayBuffer, List[Episode]],
+    output_path: str,
+    steps: int = 10000,
+    batch_size: int = 64,
+    lr: float = 1e-3,
+    n_eval_batches: int = 10,
+    n_latency_repeats: int = 1000,
+    device: torch.device = torch.device("cpu"),
+) -> Dict[str, float]:
+    logger = logging.getLogger(__name__)
+    teacher_algo = AlgoPlayOnly.from_checkpoint(checkpoint_path)
+    if not isinstance(teacher_algo, SACPlayOnly):
+        raise ValueError(f"{type(teacher_algo)=} has no GaussianPolicy to distill")
+    teacher = teacher_algo.model.policy.to(device)
+    teacher.eval()
+    student.to(device)
+    if (student.n_observations, student.n_actions) != (
+        teacher.n_observations,
+        teacher.n_actions,
+    ):
+        raise ValueError(
+            f"{student.n_observations=}, {student.n_actions=} must match {teacher.n_observations=}, {teacher.n_actions=}"
+        )
+
+    if isinstance(data, ReplayBuffer):
+        states = _ReplayStates(data)
+    else:
+        states = _EpisodeStates(data, batch_size)
+    optimizer = Adam(student, lr)
+
+    def errors(obs: torch.Tensor, mask: torch.Tensor):
+        obs, mask = obs.to(device), mask.to(device)
+        with torch.no_grad():
+            teacher_mean, teacher_log_std = teacher.forward(obs)
+        student_mean, student_log_std = student.forward(obs)
+        mean_error = (student_mean - teacher_mean) * mask
+        log_std_error = (student_log_std - teacher_log_std) * mask
+        action_error = torch.tanh(student_mean) - torch.tanh(teacher_mean)
+        action_error = action_error.abs() * mask * teacher_algo.action_scaling
+        return mean_error, log_std_error, action_error, mask
+
+    student.train()
+    for step in range(steps):
+        mean_error, log_std_error, _, mask = errors(*states.sample())
+        n_valid = mask.sum() * student.n_actions
+        loss = (mean_error.pow(2).sum() + log_std_error.pow(2).sum()) / n_valid
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        if (step + 1) % 1000 == 0:
+            log_info = f"distill step {step + 1}/{steps} | loss {loss.item():.3e}"
+            logger.info(log_info)
+
+    student.eval()
+    error_sum, error_max, n_valid = 0.0, 0.0, 0.0
+    with torch.no_grad():
+        for _ in range(n_eval_batches):
+            _, _, action_error, mask = errors(*states.sample())
+            error_sum += action_error.sum().item()
+            error_max = max(error_max, action_error.max().item())
+            n_valid += mask.sum().item() * student.n_actions
+    results = {
+        "action_error_mean": error_sum / n_valid,
+        "action_error_max": error_max,
+        "teacher_latency": _latency(teacher, teacher.n_observations, n_latency_repeats),
+        "student_latency": _latency(student, student.n_observations, n_latency_repeats),
+    }
+    log_info = f"distilled {checkpoint_path} into {output_path}: {results}"
+    logger.info(log_info)
+
+    student_algo = SACPlayOnly(
+        SACModelPlayOnly(student),
+        teacher_algo.n_actions,
+        teacher_algo.action_scaling,
+        teacher_algo.exploration_action_noise,
+        teacher_algo.stochastic_eval,
+        teacher_algo.precision,
+        teacher_algo.autocast_exclude,
+    )
+    checkpoint = torch.load(checkpoint_path)
+    checkpoint["algo"] = student_algo.get_config_dict()
+    checkpoint["network_state_dicts"] = {"policy": student.state_dict()}
+    checkpoint["optimizer_state_dicts"] = None
+    checkpoint["scheduler_state_dicts"] = None
+    checkpoint["additional_info"] = {
+        "teacher_checkpoint": checkpoint_path,
+        "distillation": results,
+    }
+    torch.save(checkpoint, output_path)
+    return results
@@ -0,0 +1,115 @@
+from copy import deepcopy
+import json
+from typing import List, Union
+import torch
+from torch import nn
+
+from ..algo import SAC, SACPlayOnly
+from ..network import GaussianPolicy
+from ..network.component import Component, LSTM
+
+
+# GaussianPolicy forward with the LSTM hidden states as explicit inputs and outputs
+class _ExportPolicy(nn.Module):
+    def __init__(self, policy: GaussianPolicy) -> None:
+        super().__init__()
+        self.head = policy.head
+        self.body = policy.body
+        self.log_std_min = policy.log_std_min
+        self.log_std_max = policy.log_std_max
+
+    @property
+    def lstms(self) -> List[LSTM]:
+        return [
+            component
+            for component in [self.head, self.body]
+            if isinstance(component, LSTM)
+        ]
+
+    def forward(self, obs_batch: torch.Tensor, *hidden_states: torch.Tensor):
+        hidden_states = list(hidden_states)
+        new_hidden_states = []
+        head_out = self._component_forward(
+            self.head, obs_batch, hidden_states, new_hidden_states
+        )
+        mean, log_std = self._component_forward(
+            self.body, head_out, hidden_states, new_hidden_states
+        )
+        log_std = torch.clamp(log_std, self.log_std_min, self.log_std_max)
+        return (mean, log_std, *new_hidden_states)
+
+    def _component_forward(
+        self,
+        component: Component,
+        state: torch.Tensor,
+        hidden_states: List[torch.Tensor],
+        new_hidden_states: List[torch.Tensor],
+    ):
+        if not isinstance(component, LSTM):
+            return component(state)
+        h_0, c_0 = hidden_states.pop(0), hidden_states.pop(0)
+        output, (h_n, c_n) = component._lstm(state, (h_0, c_0))
+        new_hidden_states += [h_n, c_n]
+        return component._output(output)
+
+
+def export_policy(
+    algo: Union[SAC, SACPlayOnly],
+    path: str,
+    export_format: str = "torchscript",
+) -> str:
+    if export_format not in ["torchscript", "onnx"]:
+        raise ValueError(f"{export_format=} must be 'torchscript' or 'onnx'")
+    policy = algo.model.policy
+    if isinstance(algo, SAC) and algo.model.encoder is not None:
+        policy = algo.model.encoder_policy
+    policy: GaussianPolicy = deepcopy(policy).to(torch.device("cpu"))
+    policy.eval()
+    export_module = _ExportPolicy(policy)
+
+    obs_batch = torch.zeros((1, 1, policy.n_observations))
+    hidden_shapes = [(lstm.n_layer, lstm.n_nodes) for lstm in export_module.lstms]
+    hidden_states = []
+    hidden_names = []
+    for i, (n_layer, n_nodes) in enumerate(hidden_shapes):
+        hidden_states += [torch.zeros((n_layer, 1, n_nodes))] * 2
+        hidden_names += [f"h_{i}", f"c_{i}"]
+    input_names = ["obs"] + hidden_names
+    output_names = ["mean", "log_std"] + [f"{name}_out" for name in hidden_names]
+
+    example_inputs = (obs_batch, *hidden_states)
+    with torch.no_grad():
+        if export_format == "torchscript":
+            traced = torch.jit.trace(export_module, example_inputs)
+            traced.save(path)
+        else:
+            dynamic_axes = {"obs": {0: "batch"}, "mean": {0: "batch"}}
+            dynamic_axes["log_std"] = {0: "batch"}
+            for name in hidden_names:
+                dynamic_axes[name] = {1: "batch"}
+                dynamic_axes[f"{name}_out"] = {1: "batch"}
+            torch.onnx.export(
+                export_module,
+                example_inputs,
+                path,
+                input_names=input_names,
+                output_names=output_names,
+                dynamic_axes=dynamic_axes,
+                dynamo=False,
+            )
+
+    metadata = {
+        "format": export_format,
+        "n_observations": policy.n_observations,
+        "n_actions": policy.n_actions,
+        "action_scaling": algo.action_scaling,
+        "exploration_action_noise": algo.exploration_action_noise,
+        "stochastic_eval": algo.stochastic_eval,
+        "hidden_shapes": hidden_shapes,
+        "input_names": input_names,
+        "output_names": output_names,
+    }
+    metadata_path = path + ".json"
+    with open(metadata_path, "w", encoding="utf-8") as file:
+        json.dump(metadata, file, indent=4)
+    return metadata_path
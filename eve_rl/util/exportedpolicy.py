@@ -0,0 +1,93 @@
+import json
+from typing import List
+import numpy as np
+
+# Runs policies exported with eve_rl.util.export.export_policy. Depends only on
+# numpy and torch (torchscript) or onnxruntime (onnx). To deploy without eve_rl copy
+# this file and import it as module exportedpolicy, importing it as
+# eve_rl.util.exportedpolicy loads eve_rl (and eve).
+
+
+class ExportedPolicy:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path + ".json", "r", encoding="utf-8") as file:
+            self.metadata = json.load(file)
+        self.export_format = self.metadata["format"]
+        self.n_observations = self.metadata["n_observations"]
+        self.n_actions = self.metadata["n_actions"]
+        self.action_scaling = self.metadata["action_scaling"]
+        self.exploration_action_noise = self.metadata["exploration_action_noise"]
+        self.stochastic_eval = self.metadata["stochastic_eval"]
+        self.hidden_shapes = self.metadata["hidden_shapes"]
+
+        if self.export_format == "torchscript":
+            import torch  # pylint: disable=import-outside-toplevel
+
+            self._torch = torch
+            self._module = torch.jit.load(path, map_location="cpu")
+            self._module.eval()
+        elif self.export_format == "onnx":
+            import onnxruntime  # pylint: disable=import-outside-toplevel
+
+            self._session = onnxruntime.InferenceSession(
+                path, providers=["CPUExecutionProvider"]
+            )
+        else:
+            raise ValueError(f"{self.export_format=} not supported")
+
+        self._hidden_states: List[np.ndarray] = None
+        self.reset()
+
+    def get_exploration_action(self, flat_state: np.ndarray) -> np.ndarray:
+        mean, log_std = self._forward(flat_state)
+        action = self._sample(mean, log_std)
+        return action + np.random.normal(0, self.exploration_action_noise)
+
+    def get_eval_action(self, flat_state: np.ndarray) -> np.ndarray:
+        mean, log_std = self._forward(flat_state)
+        if self.stochastic_eval:
+            action = self._sample(mean, log_std)
+        else:
+            action = np.tanh(mean)
+        return action * self.action_scaling
+
+    def reset(self) -> None:
+        self._hidden_states = None
+
+    # flat_state [n_observations] or [batch, n_observations]
+    def _forward(self, flat_state: np.ndarray):
+        flat_state = np.asarray(flat_state, dtype=np.float32)
+        single = flat_state.ndim == 1
+        obs_batch = flat_state.reshape(-1, 1, self.n_observations)
+        batch_size = obs_batch.shape[0]
+        if self._hidden_states is None or (
+            self._hidden_states and self._hidden_states[0].shape[1] != batch_size
+        ):
+            self._hidden_states = []
+            for n_layer, n_nodes in self.hidden_shapes:
+                zeros = np.zeros((n_layer, batch_size, n_nodes), dtype=np.float32)
+                self._hidden_states += [zeros, zeros]
+
+        if self.export_format == "torchscript":
+            with self._torch.inference_mode():
+                inputs = [self._torch.from_numpy(obs_batch)]
+                inputs += [
+                    self._torch.from_numpy(state) for state in self._hidden_states
+                ]
+                outputs = [output.numpy() for output in self._module(*inputs)]
+        else:
+            input_names = self.metadata["input_names"]
+            inputs = dict(zip(input_names, [obs_batch] + self._hidden_states))
+            outputs = self._session.run(None, inputs)
+
+        mean, log_std = outputs[0][:, 0], outputs[1][:, 0]
+        self._hidden_states = list(outputs[2:])
+        if single:
+            return mean[0], log_std[0]
+        return mean, log_std
+
+    @staticmethod
+    def _sample(mean: np.ndarray, log_std: np.ndarray) -> np.ndarray:
+        noise = np.random.standard_normal(mean.shape).astype(np.float32)
+        return np.tanh(mean + np.exp(log_std) * noise)
@@ -33,3 +33,53 @@ def flatten_obs(
         return obs_flat_np, flat_obs_to_obs
 
     raise ValueError("Wrong Observation Type")
+
+
+# Flattens observations with the layout of the first observation, built only once.
+# Flat observations are rows of preallocated arena blocks (growing from
+# min_block_rows to max_block_rows), stored rows stay valid after later calls.
+class ObsFlattener:
+    def __init__(
+        self,
+        obs: Union[np.ndarray, List[np.ndarray], Dict[str, np.ndarray]],
+        min_block_rows: int = 64,
+        max_block_rows: int = 4096,
+    ) -> None:
+        self.min_block_rows = min_block_rows
+        self.max_block_rows = max_block_rows
+        reset_flat_obs, self.flat_obs_to_obs = flatten_obs(obs)
+        self.n_flat_obs = reset_flat_obs.size
+        self.dtype = reset_flat_obs.dtype
+        if isinstance(obs, np.ndarray):
+            self._entries = None
+        elif isinstance(obs, list):
+            self._entries = [
+                (i, start, end)
+                for i, (_, (start, end)) in enumerate(self.flat_obs_to_obs)
+            ]
+        else:
+            self._entries = [
+                (name, start, end)
+                for name, (_, (start, end)) in self.flat_obs_to_obs.items()
+            ]
+        self._block: np.ndarray = None
+        self._block_rows = 0
+        self._next_row = 0
+
+    def __call__(
+        self, obs: Union[np.ndarray, List[np.ndarray], Dict[str, np.ndarray]]
+    ) -> np.ndarray:
+        if self._next_row == self._block_rows:
+            self._block_rows = min(
+                max(self._block_rows * 2, self.min_block_rows), self.max_block_rows
+            )
+            self._block = np.empty((self._block_rows, self.n_flat_obs), self.dtype)
+            self._next_row = 0
+        flat_obs = self._block[self._next_row]
+        self._next_row += 1
+        if self._entries is None:
+            flat_obs[:] = obs.reshape(-1)
+        else:
+            for key, start, end in self._entries:
+                flat_obs[start:end] = obs[key].reshape(-1)
+        return flat_obs
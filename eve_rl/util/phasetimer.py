@@ -0,0 +1,69 @@
+from contextlib import nullcontext
+from time import perf_counter
+from typing import Any, Dict, Optional
+import torch
+
+
+class _Phase:
+    __slots__ = ["timer", "name", "t_start"]
+
+    def __init__(self, timer: "PhaseTimer", name: str) -> None:
+        self.timer = timer
+        self.name = name
+        self.t_start = None
+
+    def __enter__(self):
+        self.timer.synchronize_device()
+        self.t_start = perf_counter()
+
+    def __exit__(self, *args):
+        self.timer.synchronize_device()
+        self.timer.add(self.name, perf_counter() - self.t_start)
+
+
+# Accumulates wall times per phase. Disabled, phase() returns a shared no-op context.
+class PhaseTimer:
+    _disabled_phase = nullcontext()
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        synchronize: bool = False,
+        device: Optional[torch.device] = None,
+    ) -> None:
+        self.enabled = enabled
+        self.synchronize = synchronize
+        self.device = device or torch.device("cpu")
+        self._timings: Dict[str, list] = {}
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return self._disabled_phase
+        return _Phase(self, name)
+
+    def add(self, name: str, duration: float) -> None:
+        if name not in self._timings:
+            self._timings[name] = [0, 0.0, 0.0]
+        timing = self._timings[name]
+        timing[0] += 1
+        timing[1] += duration
+        timing[2] = max(timing[2], duration)
+
+    def synchronize_device(self) -> None:
+        # kernels are asynchronous on accelerators, without sync only the launch is timed
+        if self.synchronize and self.device.type != "cpu":
+            torch.get_device_module(self.device).synchronize(self.device)
+
+    def get_timings(self, reset: bool = True) -> Dict[str, Any]:
+        timings = {
+            name: {
+                "count": count,
+                "total": total,
+                "mean": total / count,
+                "max": max_duration,
+            }
+            for name, (count, total, max_duration) in self._timings.items()
+        }
+        if reset:
+            self._timings = {}
+        return timings
@@ -0,0 +1,43 @@
+import torch
+import eve_rl
+from eve_rl.replaybuffer import Batch
+
+N_OBS = 5
+N_ACT = 2
+
+
+def mlp_body() -> eve_rl.network.component.MLP:
+    return eve_rl.network.component.MLP([16, 16])
+
+
+def lstm_body() -> eve_rl.network.component.LSTM:
+    return eve_rl.network.component.LSTM(1, 16)
+
+
+def make_sac(body, fused_critic: bool = False) -> eve_rl.algo.SAC:
+    q1 = eve_rl.network.QNetwork(body(), N_OBS, N_ACT)
+    q2 = eve_rl.network.QNetwork(body(), N_OBS, N_ACT)
+    policy = eve_rl.network.GaussianPolicy(body(), N_OBS, N_ACT)
+    model = eve_rl.model.SACModel(
+        1e-3,
+        q1,
+        q2,
+        policy,
+        eve_rl.optim.Adam(q1, 1e-3),
+        eve_rl.optim.Adam(q2, 1e-3),
+        eve_rl.optim.Adam(policy, 1e-3),
+        fused_critic=fused_critic,
+    )
+    return eve_rl.algo.SAC(model, n_actions=N_ACT)
+
+
+def episode_batch() -> Batch:
+    padding_mask = torch.ones(4, 5, 1)
+    padding_mask[0, 3:] = 0
+    return Batch(
+        torch.randn(4, 6, N_OBS),
+        torch.rand(4, 5, N_ACT) * 2 - 1,
+        torch.randn(4, 5, 1),
+        torch.zeros(4, 5, 1),
+        padding_mask,
+    )
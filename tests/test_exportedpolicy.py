@@ -0,0 +1,69 @@
+import json
+import shutil
+import subprocess
+import sys
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("eve")
+# pylint: disable=wrong-import-position
+import eve_rl
+from eve_rl.util.export import export_policy
+from sac_helpers import N_OBS, N_ACT, lstm_body, mlp_body
+
+STANDALONE_SCRIPT = """
+import json
+import sys
+import numpy as np
+sys.path.insert(0, sys.argv[1])
+from exportedpolicy import ExportedPolicy
+
+policy = ExportedPolicy(sys.argv[2])
+flat_states = np.load(sys.argv[3])
+actions = [policy.get_eval_action(flat_state).tolist() for flat_state in flat_states]
+assert "eve_rl" not in sys.modules and "eve" not in sys.modules
+print(json.dumps(actions))
+"""
+
+
+@pytest.mark.parametrize("body", [mlp_body, lstm_body])
+def test_exported_policy_runs_standalone(tmp_path, body):
+    torch.manual_seed(0)
+    policy = eve_rl.network.GaussianPolicy(body(), N_OBS, N_ACT)
+    algo = eve_rl.algo.SACPlayOnly(
+        eve_rl.model.SACModelPlayOnly(policy), N_ACT, action_scaling=2.0
+    )
+    model_path = str(tmp_path / "policy.pt")
+    export_policy(algo, model_path, "torchscript")
+
+    # only the copied file, eve_rl is not on the path of the subprocess
+    standalone_dir = tmp_path / "standalone"
+    standalone_dir.mkdir()
+    source = eve_rl.util.__path__[0] + "/exportedpolicy.py"
+    shutil.copy(source, standalone_dir / "exportedpolicy.py")
+    flat_states = np.random.rand(4, N_OBS).astype(np.float32)
+    states_path = str(tmp_path / "states.npy")
+    np.save(states_path, flat_states)
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-I",
+            "-c",
+            STANDALONE_SCRIPT,
+            str(standalone_dir),
+            model_path,
+            states_path,
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=tmp_path,
+    )
+    actions = np.array(json.loads(output.stdout))
+
+    algo.reset()
+    expected = np.array(
+        [algo.get_eval_action(flat_state) for flat_state in flat_states]
+    )
+    assert np.allclose(actions, expected, atol=1e-5)
@@ -0,0 +1,99 @@
+from copy import deepcopy
+import pytest
+import torch
+
+pytest.importorskip("eve")
+# pylint: disable=wrong-import-position
+import eve_rl
+from sac_helpers import N_OBS, N_ACT, episode_batch, lstm_body, make_sac, mlp_body
+
+
+@pytest.mark.parametrize(
+    "body,fused",
+    [
+        (mlp_body, True),
+        (lstm_body, False),
+    ],
+)
+def test_fused_critic_matches_separate_critics(body, fused):
+    torch.manual_seed(0)
+    sac = make_sac(body, fused_critic=False)
+    sac_fused = deepcopy(sac)
+    sac_fused.model.fused_critic = True
+    sac_fused.model.q_ensemble = eve_rl.network.QNetworkEnsemble(
+        [sac_fused.model.q1, sac_fused.model.q2]
+    )
+    sac_fused.model.target_q_ensemble = eve_rl.network.QNetworkEnsemble(
+        [sac_fused.model.target_q1, sac_fused.model.target_q2]
+    )
+    assert sac_fused.model.q_ensemble.fused == fused
+
+    for i in range(3):
+        batch = episode_batch()
+        torch.manual_seed(i)
+        sac.update(batch)
+        torch.manual_seed(i)
+        sac_fused.update(batch)
+
+    for name in ["q1", "q2", "target_q1", "target_q2", "policy"]:
+        params = getattr(sac.model, name).parameters()
+        params_fused = getattr(sac_fused.model, name).parameters()
+        for param, param_fused in zip(params, params_fused):
+            assert torch.allclose(param, param_fused, atol=1e-5)
+
+
+def test_lstm_critic_with_fused_critic_updates():
+    torch.manual_seed(0)
+    sac = make_sac(lstm_body, fused_critic=True)
+    assert not sac.model.q_ensemble.fused
+    sac.update(episode_batch())
+    assert sac.get_loss_stats()["count"] == 1
+
+
+def test_stacked_parameters_follow_parameter_changes():
+    torch.manual_seed(0)
+    sac = make_sac(mlp_body, fused_critic=True)
+    ensemble = sac.model.q_ensemble
+    obs = torch.randn(3, 1, N_OBS)
+    actions = torch.randn(3, 1, N_ACT)
+    with torch.no_grad():
+        ensemble(obs, actions)
+        stacked = ensemble._stacked
+        ensemble(obs, actions)
+        assert ensemble._stacked is stacked
+        sac.model.q1.body._output_layer.bias.add_(1.0)
+        q_values = ensemble(obs, actions)
+    assert ensemble._stacked is not stacked
+    assert torch.allclose(q_values[0], sac.model.q1(obs, actions))
+
+    sac.model.q1.body._output_layer.bias.data = torch.zeros(1)
+    with torch.no_grad():
+        q_values = ensemble(obs, actions)
+    assert torch.allclose(q_values[0], sac.model.q1(obs, actions))
+    deepcopy(sac.model)
+
+
+def test_grad_forward_does_not_reuse_stacked_parameters():
+    torch.manual_seed(0)
+    sac = make_sac(mlp_body, fused_critic=True)
+    ensemble = sac.model.q_ensemble
+    q1 = sac.model.q1
+    obs = torch.randn(3, 1, N_OBS)
+    actions = torch.randn(3, 1, N_ACT)
+
+    # a second forward and backward before the step, then an out of place update
+    ensemble(obs, actions).sum().backward()
+    ensemble(obs, actions)[0].sum().backward()
+    assert ensemble._stacked is None
+    with torch.no_grad():
+        for param in q1.parameters():
+            param.data = param.data * 0.5
+    for net in (q1, sac.model.q2):
+        net.zero_grad()
+
+    ensemble(obs, actions)[0].sum().backward()
+    grads = [param.grad.clone() for param in q1.parameters()]
+    q1.zero_grad()
+    q1(obs, actions).sum().backward()
+    for grad, param in zip(grads, q1.parameters()):
+        assert torch.allclose(grad, param.grad, atol=1e-6)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("eve")
+# pylint: disable=wrong-import-position
+import eve_rl
+
+N_OBS = 8
+N_ACT = 3
+# dynamic int8 quantization error of the tanh squashed action, per action_scaling
+ACTION_TOLERANCE = 0.05
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        lambda: eve_rl.network.component.MLP([64, 64]),
+        lambda: eve_rl.network.component.LSTM(1, 64),
+    ],
+)
+def test_quantized_policy_matches_float_policy(body):
+    torch.manual_seed(0)
+    np.random.seed(0)
+    policy = eve_rl.network.GaussianPolicy(body(), N_OBS, N_ACT)
+    algo = eve_rl.algo.SACPlayOnly(
+        eve_rl.model.SACModelPlayOnly(policy, quantize=True),
+        N_ACT,
+        action_scaling=2.0,
+    )
+    flat_states = np.random.uniform(-1, 1, (256, N_OBS)).astype(np.float32)
+
+    error = algo.quantization_error(flat_states)
+    assert error["max"] <= ACTION_TOLERANCE * algo.action_scaling
+
+    # refreshed weights are quantized again
+    state_dicts = {"policy": policy.state_dict()}
+    for value in state_dicts["policy"].values():
+        value.mul_(1.5)
+    algo.load_state_dicts_network(state_dicts)
+    error = algo.quantization_error(flat_states)
+    assert error["max"] <= ACTION_TOLERANCE * algo.action_scaling
+
+
+def test_close_removes_quantized_policy():
+    policy = eve_rl.network.GaussianPolicy(
+        eve_rl.network.component.MLP([16, 16]), N_OBS, N_ACT
+    )
+    model = eve_rl.model.SACModelPlayOnly(policy, quantize=True)
+    model.close()
+    assert not hasattr(model, "policy")
+    assert not hasattr(model, "policy_quantized")
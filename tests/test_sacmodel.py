@@ -0,0 +1,76 @@
+from copy import deepcopy
+import pytest
+import torch
+
+pytest.importorskip("eve")
+# pylint: disable=wrong-import-position
+from sac_helpers import N_ACT, episode_batch, lstm_body, make_sac, mlp_body
+
+
+def pre_fusion_checkpoint(network_state, optim_state):
+    # layout from before the fused output layer: the policy body had one
+    # linear layer per head (mean, log_std) in _output_layers
+    network_state = dict(network_state)
+    for param_name in ["weight", "bias"]:
+        key = "body._output_layer." + param_name
+        for i, param in enumerate(network_state.pop(key).split(N_ACT)):
+            network_state[f"body._output_layers.{i}.{param_name}"] = param
+
+    n_params = len(optim_state["param_groups"][0]["params"])
+    weight_idx, bias_idx = n_params - 2, n_params - 1
+    old_idx = {
+        weight_idx: [n_params - 2, n_params],
+        bias_idx: [n_params - 1, n_params + 1],
+    }
+    state = {}
+    for idx, param_state in optim_state["state"].items():
+        if idx not in old_idx:
+            state[idx] = param_state
+            continue
+        for head, head_idx in enumerate(old_idx[idx]):
+            state[head_idx] = {
+                key: value.split(N_ACT)[head] if value.dim() > 0 else value
+                for key, value in param_state.items()
+            }
+    param_group = dict(optim_state["param_groups"][0], params=list(range(n_params + 2)))
+    return network_state, {"state": state, "param_groups": [param_group]}
+
+
+@pytest.mark.parametrize("body", [mlp_body, lstm_body])
+def test_load_pre_fusion_checkpoint(body):
+    torch.manual_seed(0)
+    sac = make_sac(body)
+    for _ in range(3):
+        sac.update(episode_batch())
+    network_states = deepcopy(sac.model.state_dicts_network())
+    optim_states = deepcopy(sac.model.state_dicts_optimizer())
+    policy_optim_state = optim_states["policy_optim"]
+    network_states["policy"], optim_states["policy_optim"] = pre_fusion_checkpoint(
+        network_states["policy"], optim_states["policy_optim"]
+    )
+
+    sac_loaded = make_sac(body)
+    sac_loaded.model.load_state_dicts_network(network_states)
+    sac_loaded.model.load_state_dicts_optimizer(optim_states)
+    loaded_state = sac_loaded.model.policy_optimizer.state_dict()
+    assert loaded_state["param_groups"] == policy_optim_state["param_groups"]
+    for idx, param_state in policy_optim_state["state"].items():
+        for key, value in param_state.items():
+            assert torch.equal(loaded_state["state"][idx][key], value)
+
+    batch = episode_batch()
+    torch.manual_seed(1)
+    sac.update(batch)
+    torch.manual_seed(1)
+    sac_loaded.update(batch)
+    params = sac.model.policy.parameters()
+    params_loaded = sac_loaded.model.policy.parameters()
+    for param, param_loaded in zip(params, params_loaded):
+        assert torch.allclose(param, param_loaded, atol=1e-5)
+
+
+def test_load_mismatching_optimizer_state_raises():
+    optim_states = make_sac(mlp_body).model.state_dicts_optimizer()
+    optim_states["policy_optim"]["param_groups"][0]["params"].append(99)
+    with pytest.raises(ValueError):
+        make_sac(mlp_body).model.load_state_dicts_optimizer(optim_states)
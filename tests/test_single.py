@@ -0,0 +1,112 @@
+import gymnasium as gym
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("eve")
+# pylint: disable=wrong-import-position
+import eve_rl
+from eve_rl.agent.single import Single
+from eve_rl.replaybuffer import EpisodeSummary
+from sac_helpers import N_ACT, lstm_body, make_sac, mlp_body
+
+
+class ToyEnv(gym.Env):
+    # fixed episode length, the observations depend on the reset seed
+    def __init__(self, n_steps: int):
+        self.n_steps = n_steps
+        self.observation_space = gym.spaces.Dict(
+            {"pos": gym.spaces.Box(-1, 1, (3,)), "tgt": gym.spaces.Box(-1, 1, (2,))}
+        )
+        self.action_space = gym.spaces.Box(-2, 2, (N_ACT,))
+        self.reset_seeds = []
+        self._t = 0
+
+    def _obs(self):
+        pos = self.np_random.uniform(-1, 1, 3).astype(np.float32)
+        return {"pos": pos, "tgt": np.array([0.5, self._t / 10], dtype=np.float32)}
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.reset_seeds.append(seed)
+        self._t = 0
+        return self._obs(), {}
+
+    def step(self, action):
+        self._t += 1
+        info = {"success": float(self._t == self.n_steps), "t": self._t}
+        reward = -float(np.abs(action).sum())
+        return self._obs(), reward, False, self._t >= self.n_steps, info
+
+    def render(self):
+        pass
+
+
+def make_agent(body=mlp_body, **kwargs) -> Single:
+    envs = [ToyEnv(3), ToyEnv(5)]
+    replay_buffer = eve_rl.replaybuffer.VanillaEpisode(1000, 4)
+    return Single(make_sac(body), envs, envs, replay_buffer, **kwargs)
+
+
+def test_env_list_counters_stop_after_the_running_episodes():
+    torch.manual_seed(0)
+    agent = make_agent()
+
+    # 3 + 5 steps, the second episode of the first env starts at 6 < 10 running
+    # steps and finishes the heatup with 11 steps
+    episodes = agent.heatup(steps=10)
+    assert [len(episode) for episode in episodes] == [3, 5, 3]
+    assert agent.step_counter.heatup == 11
+    assert agent.episode_counter.heatup == 3
+    assert len(agent.replay_buffer) == 3
+
+    episodes = agent.explore(episodes=3)
+    assert [len(episode) for episode in episodes] == [3, 5, 3]
+    assert agent.step_counter.exploration == 11
+    assert agent.episode_counter.exploration == 3
+    assert len(agent.replay_buffer) == 6
+
+
+def test_env_list_seeds_are_assigned_in_order():
+    torch.manual_seed(0)
+    agent = make_agent()
+    seeds = [1, 2, 3, 4]
+    episodes = agent.evaluate(seeds=seeds)
+
+    # seeds are popped from the end, envs pick the next one when they are free
+    assert seeds == [1, 2, 3, 4]
+    assert [episode.seed for episode in episodes] == [4, 3, 2, 1]
+    assert [len(episode) for episode in episodes] == [3, 5, 3, 5]
+    assert agent.env_eval[0].reset_seeds == [4, 2]
+    assert agent.env_eval[1].reset_seeds == [3, 1]
+    assert agent.episode_counter.evaluation == 4
+    assert agent.step_counter.evaluation == 16
+
+
+def test_env_list_resets_the_lstm_state_of_new_episodes():
+    torch.manual_seed(0)
+    agent = make_agent(lstm_body)
+    episodes = agent.evaluate(seeds=[1, 2, 3, 4])
+
+    # every episode has to act as if it was played alone with a fresh hidden state
+    for episode in episodes:
+        env = ToyEnv(len(episode))
+        single = Single(
+            agent.algo, env, env, eve_rl.replaybuffer.VanillaEpisode(1000, 4)
+        )
+        (alone,) = single.evaluate(seeds=[episode.seed])
+        assert np.allclose(np.stack(episode.actions), np.stack(alone.actions))
+
+
+def test_env_list_streams_summaries():
+    torch.manual_seed(0)
+    agent = make_agent(episode_results="summary", summary_info_keys=["success"])
+    streamed = []
+    episodes = agent.explore(episodes=3, episode_callback=streamed.append)
+
+    assert episodes == []
+    assert all(isinstance(summary, EpisodeSummary) for summary in streamed)
+    assert [summary.n_steps for summary in streamed] == [3, 5, 3]
+    assert all(summary.final_info == {"success": 1.0} for summary in streamed)
+    # full episodes still go to the replay buffer
+    assert len(agent.replay_buffer) == 3
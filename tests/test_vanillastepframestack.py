@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("eve")
+# pylint: disable=wrong-import-position
+import eve_rl
+from eve_rl.replaybuffer import Episode
+from eve_rl.replaybuffer.replaybuffer import EpisodeReplay
+
+N_FRAMES = 3
+FRAME_SIZE = 2
+FLAT_OBS_TO_OBS = {
+    "tgt": ((2,), (0, 2)),
+    "pos": ((N_FRAMES, FRAME_SIZE), (2, 2 + N_FRAMES * FRAME_SIZE)),
+}
+EPISODE_LENGTHS = [5, 3, 7, 4, 6, 2, 8]
+# 42 rows (steps + 1 per episode) in 17: the last episode wraps around the end
+# of the ring buffer and only the steps 2 to 6 of episode 4 are left
+CAPACITY = 17
+
+
+def make_episode(episode_id: int, n_steps: int, newest_first: bool) -> Episode:
+    # every frame is unique, the history before the reset repeats the first frame
+    frames = [
+        np.full(FRAME_SIZE, episode_id * 100 + step) for step in range(n_steps + 1)
+    ]
+    flat_obs = []
+    for step in range(n_steps + 1):
+        history = [frames[max(step - lag, 0)] for lag in range(N_FRAMES)]
+        if not newest_first:
+            history = history[::-1]
+        tgt = np.array([episode_id, -step])
+        flat_obs.append(np.concatenate([tgt] + history).astype(np.float32))
+
+    episode = Episode({}, flat_obs[0], FLAT_OBS_TO_OBS)
+    for step in range(n_steps):
+        action = np.array([episode_id, step], dtype=np.float32)
+        terminal = step == n_steps - 1
+        episode.add_transition(
+            {}, flat_obs[step + 1], action, step, terminal, False, {}
+        )
+    return episode
+
+
+@pytest.mark.parametrize("newest_first", [True, False])
+def test_frame_stack_matches_vanilla_step(newest_first):
+    np.random.seed(0)
+    frame_stack = eve_rl.replaybuffer.VanillaStepFrameStack(
+        CAPACITY, 4, ["pos"], newest_first
+    )
+    vanilla = eve_rl.replaybuffer.VanillaStep(1000, 4)
+    for episode_id, n_steps in enumerate(EPISODE_LENGTHS):
+        episode = make_episode(episode_id, n_steps, newest_first)
+        frame_stack.push(episode)
+        vanilla.push(episode)
+        # VanillaStep stores len(episode) - 1 transitions, the last one is pushed
+        # again as the first of two
+        vanilla.push(
+            EpisodeReplay(
+                episode.flat_obs[-2:] + episode.flat_obs[-1:],
+                episode.actions[-1:] * 2,
+                episode.rewards[-1:] * 2,
+                episode.terminals[-1:] * 2,
+            )
+        )
+    # the last episode wrapped around
+    assert frame_stack.position < EPISODE_LENGTHS[-1] + 1
+
+    transitions = {
+        tuple(action): (obs, reward, terminal)
+        for obs, action, reward, terminal in vanilla.buffer
+    }
+    sampled = set()
+    for _ in range(200):
+        batch = frame_stack.sample()
+        for obs, action, reward, terminal in zip(*batch[:4]):
+            key = tuple(action[0].numpy())
+            expected_obs, expected_reward, expected_terminal = transitions[key]
+            assert np.array_equal(obs.numpy(), expected_obs)
+            assert reward.item() == expected_reward
+            assert terminal.item() == expected_terminal
+            sampled.add(key)
+
+    # steps 2 and 3 of episode 4 need frames that were overwritten
+    expected = {(4, 4), (4, 5)}
+    for episode_id in [5, 6]:
+        expected |= {(episode_id, step) for step in range(EPISODE_LENGTHS[episode_id])}
+    assert sampled == expected